@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+from app.engine import (
+    BATT_SOC,
+    BATTERY_COLUMNS,
+    BUY,
+    COST,
+    H2_STORAGE,
+    HYDROGEN_COLUMNS,
+    MONTH_CONSUMPTION,
+    MONTH_PRODUCTION,
+    SELL,
+    as_datetime,
+    infer_step_hours,
+    month_code_table,
+)
+from app.summary import metrics_from_totals
+
+# シナリオごとに変えられる数値パラメータ
+BATTERY_PARAMETERS = (
+    "max_battery_capacity",
+    "battery_rated_power_kwh",
+    "buy_price",
+    "sell_price",
+)
+HYDROGEN_PARAMETERS = BATTERY_PARAMETERS + (
+    "el_rated_power_kwh",
+    "el_efficiency",
+    "h2_storage_capacity_kwh",
+    "fc_rated_power_kwh",
+    "fc_efficiency",
+)
+
+
+@dataclass
+class BatchResult:
+    summary: pd.DataFrame
+    frames: list[pd.DataFrame] | None = None
+
+
+def _scenario_settings(
+    scenarios: Sequence[Mapping[str, object]] | pd.DataFrame,
+    base_settings: Mapping[str, object] | None,
+) -> list[dict[str, object]]:
+    if isinstance(scenarios, pd.DataFrame):
+        scenarios = scenarios.to_dict(orient="records")
+    return [{**(base_settings or {}), **scenario} for scenario in scenarios]
+
+
+def _month_table(settings: list[dict[str, object]]) -> np.ndarray:
+    """
+    (N, 13) table of MONTH_* codes, one row per scenario.
+    """
+    return np.array(
+        [
+            month_code_table(s["production_month"], s["consumption_month"])
+            for s in settings
+        ],
+        dtype=np.int8,
+    ).reshape(len(settings), 13)
+
+
+def run_batch_simulation(
+    df: pd.DataFrame,
+    scenarios: Sequence[Mapping[str, object]] | pd.DataFrame,
+    *,
+    hydrogen: bool = True,
+    base_settings: Mapping[str, object] | None = None,
+    return_frames: bool = False,
+) -> BatchResult:
+    """
+    Simulate N parameter sets together in one pass over the time series.
+
+    ``scenarios`` is a list of settings dicts or a DataFrame with one row per
+    scenario; missing keys are taken from ``base_settings``. Battery SOC and
+    H2 level are kept as length-N vectors and every hour advances all
+    scenarios at once, following the same rules as the single-scenario
+    engine. Totals are accumulated on the fly, so the summary table (one row
+    per scenario, parameters plus ``app.summary`` metrics) costs O(N) memory;
+    ``return_frames=True`` additionally builds a result frame per scenario.
+    """
+    settings = _scenario_settings(scenarios, base_settings)
+    names = HYDROGEN_PARAMETERS if hydrogen else BATTERY_PARAMETERS
+    params = {
+        name: np.array([float(s[name]) for s in settings], dtype=np.float64)
+        for name in names
+    }
+
+    time = as_datetime(df["TIME"])
+    load = df["load_site_kwh"].to_numpy(dtype=np.float64)
+    pv = df["pv_net_pos_kwh"].to_numpy(dtype=np.float64)
+    n_rows = len(df)
+    n_scenarios = len(settings)
+
+    # 定格出力 (kW) を 1 行あたりの電力量に換算（1分・15分データ対応）
+    step_hours = infer_step_hours(time)
+    max_capacity = params["max_battery_capacity"]
+    rated = params["battery_rated_power_kwh"] * step_hours
+    if "batt_soc_kwh" in df.columns and n_rows:
+        battery = np.full(n_scenarios, float(df["batt_soc_kwh"].iat[0]))
+    else:
+        battery = max_capacity.copy()
+    h2_storage = np.zeros(n_scenarios)
+
+    if hydrogen:
+        month_table = _month_table(settings)
+        month = time.dt.month.to_numpy(dtype=np.int64)
+        el_rated = params["el_rated_power_kwh"] * step_hours
+        el_efficiency = params["el_efficiency"]
+        h2_capacity = params["h2_storage_capacity_kwh"]
+        fc_rated = params["fc_rated_power_kwh"] * step_hours
+        fc_efficiency = params["fc_efficiency"]
+
+    columns = HYDROGEN_COLUMNS if hydrogen else BATTERY_COLUMNS
+    frames_out = (
+        np.zeros((len(columns), n_rows, n_scenarios)) if return_frames else None
+    )
+    if return_frames and n_rows:
+        frames_out[BATT_SOC, 0] = battery
+        if hydrogen:
+            frames_out[H2_STORAGE, 0] = h2_storage
+
+    total_buy = np.zeros(n_scenarios)
+    total_sell = np.zeros(n_scenarios)
+    zeros = np.zeros(n_scenarios)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for i in range(1, n_rows):
+            load_i = load[i]
+            pv_i = pv[i]
+
+            # --- 蓄電池 ---
+            battery_space = max_capacity - battery
+            if pv_i >= load_i:
+                surplus = pv_i - load_i
+                charge = np.minimum(np.minimum(surplus, rated), battery_space)
+                remain_surplus = surplus - charge
+                discharge = zeros
+                buy_electricity = zeros
+            else:
+                shortage = load_i - pv_i
+                if shortage != shortage:
+                    # load/pv が NaN の時間は単体版と同じく蓄電池を空にする
+                    discharge = battery.copy()
+                else:
+                    discharge = np.minimum(np.minimum(shortage, rated), battery)
+                buy_electricity = shortage - discharge
+                charge = zeros
+                remain_surplus = zeros
+
+            battery = battery + charge - discharge
+            battery = np.where(battery > max_capacity, max_capacity, battery)
+            battery = np.where(battery < 0, 0.0, battery)
+
+            if not hydrogen:
+                sell_electricity = remain_surplus
+            else:
+                # --- 水素 ---
+                code = month_table[:, month[i]]
+                buy_before_h2 = buy_electricity
+
+                space = np.maximum(h2_capacity - h2_storage, 0.0)
+                produce = (code == MONTH_PRODUCTION) & (remain_surplus > 0)
+                electrolyze = produce & (space > 0)
+                el_input = np.where(
+                    electrolyze,
+                    np.minimum(
+                        np.minimum(remain_surplus, el_rated), space / el_efficiency
+                    ),
+                    0.0,
+                )
+                h2_energy = el_input * el_efficiency
+                h2_storage = np.where(
+                    electrolyze,
+                    np.minimum(h2_storage + h2_energy, h2_capacity),
+                    h2_storage,
+                )
+                sell_electricity = np.where(
+                    electrolyze,
+                    np.maximum(remain_surplus - el_input, 0.0),
+                    np.where(produce, remain_surplus, 0.0),
+                )
+
+                consume = code == MONTH_CONSUMPTION
+                sell_electricity = np.where(
+                    consume & (remain_surplus > 0), remain_surplus, sell_electricity
+                )
+                use_fc = consume & (buy_electricity > 0) & (h2_storage > 0)
+                fc_possible = np.minimum(fc_rated, h2_storage * fc_efficiency)
+                fc_output = np.where(
+                    use_fc, np.minimum(buy_electricity, fc_possible), 0.0
+                )
+                fc_used = fc_output > 0
+                h2_storage = np.where(
+                    fc_used,
+                    np.maximum(h2_storage - fc_output / fc_efficiency, 0.0),
+                    h2_storage,
+                )
+                buy_electricity = np.where(
+                    fc_used, buy_electricity - fc_output, buy_electricity
+                )
+
+            total_buy += np.nan_to_num(buy_electricity)
+            total_sell += sell_electricity
+
+            if return_frames:
+                step = [
+                    zeros,
+                    battery,
+                    charge,
+                    discharge,
+                    buy_electricity,
+                    sell_electricity,
+                ]
+                if hydrogen:
+                    step += [
+                        remain_surplus,
+                        h2_storage,
+                        h2_energy,
+                        el_input,
+                        fc_output,
+                        buy_before_h2,
+                    ]
+                for row, values in enumerate(step):
+                    frames_out[row, i] = values
+
+    buy_price = params["buy_price"]
+    sell_price = params["sell_price"]
+    total_cost = total_buy * buy_price - total_sell * sell_price
+    total_pv = float(np.sum(pv))
+
+    rows = []
+    for s, scenario in enumerate(settings):
+        metrics = metrics_from_totals(
+            total_cost[s], total_buy[s], total_sell[s], total_pv
+        )
+        rows.append({**{name: scenario[name] for name in names}, **metrics})
+    summary = pd.DataFrame(rows)
+    if hydrogen:
+        summary["production_month"] = [s["production_month"] for s in settings]
+        summary["consumption_month"] = [s["consumption_month"] for s in settings]
+
+    frames = None
+    if return_frames:
+        frames_out[COST] = frames_out[BUY] * buy_price - frames_out[SELL] * sell_price
+        frames_out[COST, :1] = 0.0
+        frames = []
+        for s in range(n_scenarios):
+            frame = df.copy(deep=False)
+            frame["TIME"] = time
+            for row, name in enumerate(columns):
+                frame[name] = frames_out[row, :, s]
+            frame.attrs["backend"] = "batch"
+            frame.attrs["step_hours"] = step_hours
+            frames.append(frame)
+
+    return BatchResult(summary=summary, frames=frames)
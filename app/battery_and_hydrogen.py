@@ -5,6 +5,16 @@ from typing import Mapping, Sequence
 
 import pandas as pd
 
+from app.stages import (
+    BatteryDispatch,
+    build_result,
+    costing_stage,
+    detach_dispatch,
+    dispatch_battery_stage,
+    hydrogen_stage,
+    prepare_input,
+)
+
 
 @dataclass
 class SimulationParams:
@@ -131,16 +141,8 @@ def _cost_and_battery_capacity(
     )
 
 
-def run_battery_and_hydrogen_simulation(
-    df: pd.DataFrame, settings: Mapping[str, object]
-) -> pd.DataFrame:
-    """
-    Run the hourly simulation and return a DataFrame with additional metrics.
-    """
-    if df.empty:
-        return df.copy()
-
-    params = SimulationParams(
+def _params_from_settings(settings: Mapping[str, object]) -> SimulationParams:
+    return SimulationParams(
         max_battery_capacity=settings["max_battery_capacity"],
         buy_price=settings["buy_price"],
         sell_price=settings["sell_price"],
@@ -154,6 +156,69 @@ def run_battery_and_hydrogen_simulation(
         consumption_month=settings["consumption_month"],
     )
 
+
+def run_battery_and_hydrogen_simulation(
+    df: pd.DataFrame,
+    settings: Mapping[str, object],
+    backend: str | None = None,
+    workers: int | None = None,
+    step_hours: float | None = None,
+    dispatch: BatteryDispatch | None = None,
+    dtype: str | None = None,
+) -> pd.DataFrame:
+    """
+    Run the simulation and return a DataFrame with additional metrics.
+
+    ``backend`` selects the dispatch kernel ("auto" / "numba" / "python");
+    the one that actually ran is reported in ``df_result.attrs["backend"]``.
+    ``workers > 1`` runs long inputs chunk-parallel on a process pool.
+    Rated powers are converted to energy per row with ``step_hours``
+    (inferred from the ``TIME`` spacing when omitted), so 1-minute or
+    15-minute data can be simulated as well as hourly data.
+
+    The run is composed of the stages in ``app.stages``: battery dispatch,
+    the hydrogen layer and costing. Pass ``dispatch`` (a battery stage of
+    the same input and battery settings, e.g. from the battery-only run of
+    a comparison) to skip the battery stage. ``dtype="float32"`` stores the
+    result columns in single precision (see ``app.result``).
+    """
+    if df.empty:
+        return df.copy()
+
+    params = _params_from_settings(settings)
+
+    # 入力列は共有し、結果列だけを追加する（浅いコピー）
+    df_result = prepare_input(df)
+    # 渡された蓄電池段は他の実行と共有しているので、返す frame には複製を使う
+    shared_dispatch = dispatch is not None
+    if dispatch is None:
+        dispatch = dispatch_battery_stage(
+            df_result,
+            settings,
+            hydrogen=True,
+            backend=backend,
+            workers=workers,
+            step_hours=step_hours,
+        )
+
+    flows = hydrogen_stage(df_result, dispatch, vars(params), backend=backend)
+    results = costing_stage(flows, vars(params))
+    if shared_dispatch:
+        results = detach_dispatch(results, dispatch)
+    return build_result(df_result, results, dispatch, dtype, owned=True).to_frame()
+
+
+def run_battery_and_hydrogen_simulation_reference(
+    df: pd.DataFrame, settings: Mapping[str, object]
+) -> pd.DataFrame:
+    """
+    Original row-by-row implementation, kept to check the array engine against.
+    """
+    if df.empty:
+        return df.copy()
+
+    params = _params_from_settings(settings)
+
     df_result = df.copy()
     df_result["TIME"] = pd.to_datetime(df_result["TIME"])
 
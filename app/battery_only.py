@@ -5,6 +5,15 @@ from typing import Mapping
 
 import pandas as pd
 
+from app.stages import (
+    BatteryDispatch,
+    build_result,
+    costing_stage,
+    detach_dispatch,
+    dispatch_battery_stage,
+    prepare_input,
+)
+
 
 @dataclass(frozen=True)
 class BatteryOnlyParams:
@@ -78,17 +87,78 @@ def _step_battery_only(
     )
 
 
-def run_battery_only_simulation(
-    df: pd.DataFrame,
-    settings: Mapping[str, float],
-) -> pd.DataFrame:
-    params = BatteryOnlyParams(
+def _params_from_settings(settings: Mapping[str, float]) -> BatteryOnlyParams:
+    return BatteryOnlyParams(
         max_battery_capacity=settings["max_battery_capacity"],
         battery_rated_power_kwh=settings["battery_rated_power_kwh"],
         buy_price=settings["buy_price"],
         sell_price=settings["sell_price"],
     )
 
+
+def run_battery_only_simulation(
+    df: pd.DataFrame,
+    settings: Mapping[str, float],
+    backend: str | None = None,
+    workers: int | None = None,
+    step_hours: float | None = None,
+    dispatch: BatteryDispatch | None = None,
+    dtype: str | None = None,
+) -> pd.DataFrame:
+    """
+    Run the battery-only simulation on the shared array engine.
+
+    See ``app.engine.resolve_backend`` for how ``backend`` is chosen. With
+    ``workers > 1`` long inputs are split into segments and simulated on a
+    process pool (``app.parallel``).
+
+    Rows may be shorter than an hour (e.g. 1-minute data): the rated power
+    is converted to energy per row using ``step_hours``, which is inferred
+    from the ``TIME`` spacing when omitted.
+
+    ``dispatch`` is a precomputed battery stage of the same input and
+    battery settings (see ``app.stages``); only costing runs then.
+
+    The input columns are shared with ``df`` and the result columns are the
+    stage arrays themselves; ``dtype="float32"`` (or the
+    ``GREENNAVI_RESULT_DTYPE`` environment variable) stores them in single
+    precision instead, see ``app.result``.
+    """
+    params = _params_from_settings(settings)
+
+    # 入力列は共有し、結果列だけを追加する（浅いコピー）
+    df_result = prepare_input(df)
+    # 渡された蓄電池段は他の実行と共有しているので、返す frame には複製を使う
+    shared_dispatch = dispatch is not None
+    if df_result.empty:
+        return df_result
+    if dispatch is None:
+        dispatch = dispatch_battery_stage(
+            df_result,
+            settings,
+            backend=backend,
+            workers=workers,
+            step_hours=step_hours,
+        )
+
+    results = costing_stage(
+        dispatch.flows,
+        {"buy_price": params.buy_price, "sell_price": params.sell_price},
+    )
+    if shared_dispatch:
+        results = detach_dispatch(results, dispatch)
+    return build_result(df_result, results, dispatch, dtype, owned=True).to_frame()
+
+
+def run_battery_only_simulation_reference(
+    df: pd.DataFrame,
+    settings: Mapping[str, float],
+) -> pd.DataFrame:
+    """
+    Original row-by-row implementation, kept to check the array engine against.
+    """
+    params = _params_from_settings(settings)
+
     df_result = df.copy()
     df_result["TIME"] = pd.to_datetime(df_result["TIME"])
 
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, Hashable, Mapping
+
+import pandas as pd
+
+from app.engine import resolve_backend
+from app.result import SimulationResult, resolve_result_dtype
+from app.stages import (
+    BatteryDispatch,
+    build_result,
+    costing_stage,
+    dispatch_battery_stage,
+    hydrogen_stage,
+    pipeline,
+    prepare_input,
+    stage_dependencies,
+    stage_lineage,
+)
+
+# キャッシュする結果の最大件数（環境変数で変更可）
+SIMULATION_CACHE_SIZE = int(os.getenv("GREENNAVI_SIMULATION_CACHE_SIZE", "32"))
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU mapping with hit / miss counters.
+
+    Streamlit serves every session from threads of one process, so a
+    module-level instance is shared by all reruns and sessions.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, object] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: object = None) -> object:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: object) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], object]) -> object:
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+
+# 取り込み時に計算済みのハッシュ（id(df) -> (弱参照, ハッシュ, 段ごとのキー)）
+_known_fingerprints: dict[int, tuple[weakref.ref, str, dict[str, str]]] = {}
+_known_fingerprints_lock = threading.Lock()
+
+
+def register_fingerprint(
+    df: pd.DataFrame | SimulationResult,
+    fingerprint: str,
+    stages: Mapping[str, str] | None = None,
+) -> None:
+    """
+    Remember a precomputed content hash for ``df`` so ``fingerprint_frame``
+    does not rehash it. Only valid for frames that are never modified.
+
+    ``stages`` maps a consumer stage (e.g. ``"charts"``) to the key of the
+    part of ``df`` it reads, so it can be reused when only other columns
+    changed.
+    """
+    with _known_fingerprints_lock:
+        for key, (ref, _, _) in list(_known_fingerprints.items()):
+            if ref() is None:
+                del _known_fingerprints[key]
+        _known_fingerprints[id(df)] = (weakref.ref(df), fingerprint, dict(stages or {}))
+
+
+def fingerprint_frame(
+    df: pd.DataFrame | SimulationResult, stage: str | None = None
+) -> str:
+    """
+    Content hash of a DataFrame (values, index and column names).
+
+    With ``stage``, the key registered for that consumer stage is returned
+    when there is one (see ``register_fingerprint``).
+    """
+    known = _known_fingerprints.get(id(df))
+    if known is not None and known[0]() is df:
+        if stage is not None and stage in known[2]:
+            return known[2][stage]
+        return known[1]
+    if isinstance(df, SimulationResult):
+        df = df.to_frame()
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([str(c) for c in df.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def normalize_settings(settings: Mapping[str, object], keys=None) -> str:
+    """
+    Canonical JSON for the settings that affect the result.
+
+    Month lists are only used for membership tests, so they are sorted.
+    """
+    keys = sorted(settings) if keys is None else keys
+    normalized = {}
+    for key in keys:
+        value = settings.get(key)
+        if isinstance(value, (list, tuple, set)):
+            value = sorted(value)
+        normalized[key] = value
+    return json.dumps(normalized, sort_keys=True, default=str)
+
+
+simulation_cache = LRUCache(SIMULATION_CACHE_SIZE)
+# 蓄電池段の結果（蓄電池のみ / 蓄電池 + 水素の両シナリオで共有）
+dispatch_cache = LRUCache(SIMULATION_CACHE_SIZE)
+# 水素段まで終えた料金抜きのエネルギー収支（単価だけの変更ではそのまま使う）
+flows_cache = LRUCache(SIMULATION_CACHE_SIZE)
+
+
+def stage_key(
+    name: str,
+    fingerprint: str,
+    settings: Mapping[str, object],
+    hydrogen: bool,
+    options: Mapping[str, object],
+) -> str:
+    """
+    Cache key of stage ``name``: the input, the settings the stage depends
+    on (see ``app.stages.stage_dependencies``), the stages it is built
+    from and the run ``options``.
+
+    Stages with the same lineage share a key across scenarios, e.g. the
+    battery dispatch of a comparison run.
+    """
+    key = (
+        stage_lineage(name, hydrogen),
+        fingerprint,
+        normalize_settings(settings, stage_dependencies(name, hydrogen)),
+        normalize_settings(options),
+    )
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+
+def _run_options(
+    hydrogen: bool, backend: str | None, step_hours: float | None
+) -> dict[str, object]:
+    # ワーカー数は結果を変えないのでキーに含めない
+    return {"backend": resolve_backend(backend, hydrogen), "step_hours": step_hours}
+
+
+def cached_battery_dispatch(
+    df: pd.DataFrame,
+    settings: Mapping[str, object],
+    hydrogen: bool = False,
+    backend: str | None = None,
+    workers: int | None = None,
+    step_hours: float | None = None,
+    fingerprint: str | None = None,
+) -> BatteryDispatch:
+    """
+    Memoized battery stage, keyed by the input and the battery settings only.
+
+    Both scenarios resolve to the same kernel unless ``"vectorized"`` is
+    requested, so a comparison run dispatches the battery once.
+    """
+    options = _run_options(hydrogen, backend, step_hours)
+    key = stage_key(
+        "dispatch", fingerprint or fingerprint_frame(df), settings, hydrogen, options
+    )
+    return dispatch_cache.get_or_compute(
+        key,
+        lambda: dispatch_battery_stage(
+            prepare_input(df),
+            settings,
+            hydrogen=hydrogen,
+            backend=options["backend"],
+            workers=workers,
+            step_hours=step_hours,
+        ),
+    )
+
+
+def _cached(
+    df: pd.DataFrame,
+    settings: Mapping[str, object],
+    hydrogen: bool,
+    backend: str | None = None,
+    workers: int | None = None,
+    step_hours: float | None = None,
+    dtype: str | None = None,
+) -> SimulationResult:
+    """
+    Run the stages of ``app.stages`` incrementally.
+
+    Every stage is cached under the settings it depends on, so a change
+    only re-runs the stages downstream of it: a new tariff re-costs the
+    cached energy flows, a new hydrogen setting reuses the battery dispatch.
+    The cached result shares the input and the stage arrays (float64 only;
+    see ``app.result``).
+    """
+    if df.empty:
+        return SimulationResult(df.copy(deep=False), {})
+
+    fingerprint = fingerprint_frame(df)
+    options = _run_options(hydrogen, backend, step_hours)
+    # 結果列の型は蓄電池段・水素段の出力には影響しない
+    result_options = {**options, "dtype": resolve_result_dtype(dtype).name}
+    keys = {
+        name: stage_key(
+            name,
+            fingerprint,
+            settings,
+            hydrogen,
+            options if name in ("dispatch", "hydrogen") else result_options,
+        )
+        for name in pipeline(hydrogen)
+    }
+
+    def compute() -> SimulationResult:
+        df_result = prepare_input(df)
+        dispatch = cached_battery_dispatch(
+            df,
+            settings,
+            hydrogen,
+            backend=backend,
+            workers=workers,
+            step_hours=step_hours,
+            fingerprint=fingerprint,
+        )
+        flows = dispatch.flows
+        if hydrogen:
+            flows = flows_cache.get_or_compute(
+                keys["hydrogen"],
+                lambda: hydrogen_stage(
+                    df_result, dispatch, settings, backend=options["backend"]
+                ),
+            )
+        result = build_result(
+            df_result, costing_stage(flows, settings), dispatch, dtype
+        )
+        # 結果は入力と設定で決まるので、キャッシュキーをハッシュの代わりに使う
+        register_fingerprint(result, keys["costing"], stages={"charts": keys["charts"]})
+        return result
+
+    return simulation_cache.get_or_compute(keys["costing"], compute)
+
+
+def cached_run_battery_only_simulation(
+    df: pd.DataFrame, settings: Mapping[str, object], **kwargs
+) -> SimulationResult:
+    """
+    Memoized battery-only run (``run_battery_only_simulation``) as a
+    ``SimulationResult``; it is shared between callers, use ``to_frame``
+    for a DataFrame.
+    """
+    return _cached(df, settings, False, **kwargs)
+
+
+def cached_run_battery_and_hydrogen_simulation(
+    df: pd.DataFrame, settings: Mapping[str, object], **kwargs
+) -> SimulationResult:
+    """
+    Memoized battery + hydrogen run (``run_battery_and_hydrogen_simulation``)
+    as a shared ``SimulationResult``.
+
+    The battery stage comes from ``cached_battery_dispatch``, so after a
+    battery-only run with the same battery settings only the hydrogen layer
+    and costing run.
+    """
+    return _cached(df, settings, True, **kwargs)
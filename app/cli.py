@@ -0,0 +1,388 @@
+"""
+Headless batch runner: simulate many site datasets with one parameter file.
+
+    python -m app.cli data/*.csv --params params.yaml --output summary.csv
+    python -m app.cli data/ --params params.json --output summary.parquet \\
+        --scenario hydrogen --results-dir results/ --workers 4
+
+The parameter file (YAML or JSON) maps the fields of ``SimulationParams``
+to values; the battery-only scenario only needs the battery and price
+fields. Every dataset is simulated on a process pool and its ``summarize``
+metrics become one row of the ``--output`` table (CSV / Parquet / Feather,
+by extension). Without ``--results-dir`` only the totals are computed
+(``run_summary_simulation``); with it the full per-row results are written
+too, one file per dataset and scenario.
+
+Nothing here imports Streamlit or matplotlib, so it runs from cron jobs and
+containers without a display.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import fields
+from pathlib import Path
+from typing import Mapping, Sequence
+
+import pandas as pd
+
+try:
+    import yaml
+except ImportError:  # PyYAML は任意依存（無ければ JSON のパラメータファイルのみ）
+    yaml = None
+
+from app.battery_and_hydrogen import (
+    SimulationParams,
+    run_battery_and_hydrogen_simulation,
+)
+from app.battery_only import BatteryOnlyParams, run_battery_only_simulation
+from app.engine import BACKENDS
+from app.ingest import parse_simulation_file
+from app.instrument import LOGGER_NAME, configure_logging
+from app.preprocess.data_process import (
+    OUTPUT_FORMATS,
+    output_format_for,
+    write_hourly_frame,
+)
+from app.result import RESULT_DTYPES
+from app.stages import run_summary_simulation
+from app.summary import METRIC_LABELS, compute_metrics
+
+logger = logging.getLogger(f"{LOGGER_NAME}.cli")
+
+# シナリオ名 -> 水素を使うか（"both" は蓄電池 → 水素の順に両方）
+SCENARIOS = {"battery": False, "hydrogen": True}
+SCENARIO_CHOICES = ("both", *SCENARIOS)
+
+# ディレクトリを指定したときに読み込む入力ファイル
+INPUT_SUFFIXES = (".csv", ".parquet", ".feather", ".arrow")
+
+# 集計表の列（指標は summarize と同じキー）
+SUMMARY_COLUMNS = (
+    "dataset",
+    "scenario",
+    "rows",
+    "step_hours",
+    "backend",
+    *METRIC_LABELS,
+    "reduction_rate",
+    "results",
+    "error",
+)
+
+
+def scenario_names(scenario: str) -> list[str]:
+    return list(SCENARIOS) if scenario == "both" else [scenario]
+
+
+def load_params(path: Path, hydrogen: bool = True) -> dict[str, object]:
+    """
+    Read a YAML / JSON parameter file into a settings mapping.
+
+    Every field of ``SimulationParams`` is required (only those of
+    ``BatteryOnlyParams`` when ``hydrogen`` is off); unknown keys are
+    rejected so that typos do not silently fall back to nothing.
+    """
+    path = Path(path)
+    text = path.read_text(encoding="utf-8")
+    if path.suffix.lower() in (".yaml", ".yml"):
+        if yaml is None:
+            raise ValueError(
+                "PyYAML is required for YAML parameter files (pip install pyyaml)"
+            )
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected a mapping of SimulationParams fields")
+
+    known = [field.name for field in fields(SimulationParams)]
+    required = [
+        field.name
+        for field in fields(SimulationParams if hydrogen else BatteryOnlyParams)
+    ]
+    unknown = sorted(set(data) - set(known))
+    missing = [name for name in required if name not in data]
+    if unknown or missing:
+        problems = []
+        if missing:
+            problems.append(f"missing {', '.join(missing)}")
+        if unknown:
+            problems.append(f"unknown {', '.join(unknown)}")
+        raise ValueError(f"{path}: {'; '.join(problems)}")
+    return {name: data[name] for name in required}
+
+
+def find_inputs(paths: Sequence[Path]) -> list[Path]:
+    """
+    Input files in the given order; a directory stands for its
+    ``INPUT_SUFFIXES`` files (not recursive, sorted by name).
+    """
+    inputs: list[Path] = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            inputs.extend(
+                sorted(
+                    child
+                    for child in path.iterdir()
+                    if child.is_file() and child.suffix.lower() in INPUT_SUFFIXES
+                )
+            )
+        elif path.is_file():
+            inputs.append(path)
+        else:
+            raise ValueError(f"input not found: {path}")
+    # 同じファイルを 2 回指定しても 1 回だけ実行する
+    return list(dict.fromkeys(inputs))
+
+
+def results_path(
+    results_dir: Path, dataset: Path, scenario: str, results_format: str
+) -> Path:
+    return results_dir / f"{dataset.stem}_{scenario}{OUTPUT_FORMATS[results_format]}"
+
+
+def _reduction_rate(buy: float, battery_only_buy: float | None) -> float:
+    # summarize と同じ定義（水素導入時の買電量 / 蓄電池単体の買電量）
+    if battery_only_buy is None or battery_only_buy == 0:
+        return math.nan
+    return buy / battery_only_buy * 100
+
+
+def run_dataset(
+    path: Path,
+    settings: Mapping[str, object],
+    scenarios: Sequence[str],
+    *,
+    backend: str | None = None,
+    results_dir: Path | None = None,
+    results_format: str = "parquet",
+    dtype: str | None = None,
+) -> list[dict[str, object]]:
+    """
+    Simulate one dataset for each scenario and return one summary row per
+    scenario. Failures are reported in the ``error`` column instead of
+    being raised, so one broken file does not stop the batch.
+    """
+    rows = []
+    battery_only_buy = None
+    try:
+        df = parse_simulation_file(path, path.name)
+        for scenario in scenarios:
+            hydrogen = SCENARIOS[scenario]
+            row: dict[str, object] = {"dataset": str(path), "scenario": scenario}
+            if results_dir is None:
+                # 集計だけなら結果列を作らない（メモリがデータ長に比例しない）
+                summary = run_summary_simulation(
+                    df, settings, hydrogen=hydrogen, backend=backend
+                )
+                metrics = compute_metrics(summary)
+                row.update(
+                    rows=summary.rows,
+                    step_hours=summary.step_hours,
+                    backend=summary.backend,
+                )
+            else:
+                run = (
+                    run_battery_and_hydrogen_simulation
+                    if hydrogen
+                    else run_battery_only_simulation
+                )
+                result = run(df, settings, backend=backend, dtype=dtype)
+                metrics = compute_metrics(result)
+                output = results_path(results_dir, path, scenario, results_format)
+                write_hourly_frame(result, output, results_format)
+                row.update(
+                    rows=len(result),
+                    step_hours=result.attrs.get("step_hours"),
+                    backend=result.attrs.get("backend"),
+                    results=str(output),
+                )
+            row.update(metrics)
+            if hydrogen:
+                row["reduction_rate"] = _reduction_rate(
+                    metrics["total_buy_electricity"], battery_only_buy
+                )
+            else:
+                battery_only_buy = metrics["total_buy_electricity"]
+            rows.append(row)
+    except Exception as error:  # noqa: BLE001
+        if isinstance(error, KeyError):
+            message = f"required column not found: {error}"
+        else:
+            message = str(error)
+        done = {row["scenario"] for row in rows}
+        rows.extend(
+            {"dataset": str(path), "scenario": scenario, "error": message}
+            for scenario in scenarios
+            if scenario not in done
+        )
+    return rows
+
+
+def run_batch(
+    inputs: Sequence[Path],
+    settings: Mapping[str, object],
+    scenarios: Sequence[str],
+    *,
+    max_workers: int | None = None,
+    **options,
+) -> pd.DataFrame:
+    """
+    Run ``run_dataset`` for every input, one dataset per task on a process
+    pool, and return the summary table in input order.
+
+    ``options`` are passed through to ``run_dataset``.
+    """
+    total = len(inputs)
+    results: list[list[dict[str, object]]] = [[] for _ in inputs]
+
+    def report(done: int, index: int) -> None:
+        errors = [row["error"] for row in results[index] if row.get("error")]
+        status = f"error: {errors[0]}" if errors else "ok"
+        logger.info("[%d/%d] %s %s", done, total, inputs[index], status)
+
+    workers = max_workers or os.cpu_count() or 1
+    if workers <= 1 or total <= 1:
+        for index, path in enumerate(inputs):
+            results[index] = run_dataset(path, settings, scenarios, **options)
+            report(index + 1, index)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, total)) as pool:
+            futures = {}
+            for index, path in enumerate(inputs):
+                future = pool.submit(
+                    run_dataset, path, dict(settings), scenarios, **options
+                )
+                futures[future] = index
+            for done, future in enumerate(as_completed(futures), start=1):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as error:  # noqa: BLE001  ワーカー自体が落ちた場合
+                    results[index] = [
+                        {
+                            "dataset": str(inputs[index]),
+                            "scenario": scenario,
+                            "error": str(error),
+                        }
+                        for scenario in scenarios
+                    ]
+                report(done, index)
+
+    table = pd.DataFrame(
+        [row for rows in results for row in rows], columns=list(SUMMARY_COLUMNS)
+    )
+    return table.astype({"rows": "Int64"})
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli",
+        description=__doc__.split("\n\n")[0].strip(),
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        type=Path,
+        metavar="INPUT",
+        help="simulation CSV / Parquet / Feather files or directories of them",
+    )
+    parser.add_argument(
+        "--params",
+        type=Path,
+        required=True,
+        help="YAML / JSON file with the SimulationParams fields",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        required=True,
+        help="summary table (.csv / .parquet / .feather)",
+    )
+    parser.add_argument("--scenario", choices=SCENARIO_CHOICES, default="both")
+    parser.add_argument(
+        "--results-dir",
+        type=Path,
+        help="also write the full per-row results here (<input>_<scenario>.*)",
+    )
+    parser.add_argument(
+        "--results-format", choices=list(OUTPUT_FORMATS), default="parquet"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="worker processes (default: CPU count)",
+    )
+    parser.add_argument("--backend", choices=BACKENDS, default=None)
+    parser.add_argument(
+        "--dtype",
+        choices=RESULT_DTYPES,
+        default=None,
+        help="dtype of the full result columns",
+    )
+    parser.add_argument(
+        "--log-level",
+        default=None,
+        help="INFO / DEBUG also log the time of every stage (default: progress only)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    configure_logging(args.log_level)
+    if args.log_level is None:
+        # 既定では進捗だけを出し、段ごとの処理時間は --log-level INFO で出す
+        logging.getLogger(f"{LOGGER_NAME}.instrument").setLevel(logging.WARNING)
+
+    scenarios = scenario_names(args.scenario)
+    try:
+        hydrogen = any(SCENARIOS[scenario] for scenario in scenarios)
+        settings = load_params(args.params, hydrogen=hydrogen)
+        inputs = find_inputs(args.inputs)
+    except (OSError, ValueError) as error:
+        print(f"error: {error}", file=sys.stderr)
+        return 2
+    if not inputs:
+        print("error: no input files", file=sys.stderr)
+        return 2
+    if args.results_dir is not None:
+        stems = [path.stem for path in inputs]
+        duplicated = sorted({stem for stem in stems if stems.count(stem) > 1})
+        if duplicated:
+            print(
+                f"error: inputs share a file name ({', '.join(duplicated)}); "
+                "their results would overwrite each other",
+                file=sys.stderr,
+            )
+            return 2
+        args.results_dir.mkdir(parents=True, exist_ok=True)
+
+    table = run_batch(
+        inputs,
+        settings,
+        scenarios,
+        max_workers=args.workers,
+        backend=args.backend,
+        results_dir=args.results_dir,
+        results_format=args.results_format,
+        dtype=args.dtype,
+    )
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    write_hourly_frame(table, args.output, output_format_for(args.output))
+
+    failed = table["error"].notna().sum()
+    print(f"{len(inputs)} dataset(s), {failed} failed run(s): {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
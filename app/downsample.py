@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+# ブラウザに送る 1 系列あたりの点数の既定値（グラフの横幅 px 程度）
+DEFAULT_POINTS = 1500
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of ``threshold`` points of
+    ``(x, y)`` that keep the visual shape of the line.
+
+    The first and last points are always kept and the result is in
+    increasing order. Each bucket keeps the point forming the largest
+    triangle with the previously kept point and the mean of the next bucket.
+    NaN values are never preferred over real ones.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # 両端を除いた n - 2 点を threshold - 2 個のバケットに分ける
+    bucket = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * bucket).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    with np.errstate(invalid="ignore"):
+        for i in range(threshold - 2):
+            start, stop = edges[i], edges[i + 1]
+            # 次のバケット（最後は終点）の平均
+            next_stop = edges[i + 2] if i + 2 < len(edges) else n
+            next_x = x[stop:next_stop].mean()
+            valid = y[stop:next_stop]
+            valid = valid[~np.isnan(valid)]
+            next_y = valid.mean() if valid.size else np.nan
+
+            area = np.abs(
+                (x[a] - next_x) * (y[start:stop] - y[a])
+                - (x[a] - x[start:stop]) * (next_y - y[a])
+            )
+            area[np.isnan(area)] = -1.0
+            a = start + int(np.argmax(area))
+            indices[i + 1] = a
+    return indices
+
+
+def downsample_frame(
+    df: pd.DataFrame,
+    columns: Sequence[str],
+    start: pd.Timestamp | None = None,
+    end: pd.Timestamp | None = None,
+    points: int = DEFAULT_POINTS,
+) -> pd.DataFrame:
+    """
+    Long-format (``TIME``, ``series``, ``value``) frame of ``columns`` within
+    ``[start, end]``, each series reduced to at most ``points`` rows by LTTB.
+
+    Only the visible range is downsampled, so zooming in shows more detail.
+    ``df["TIME"]`` must be sorted.
+    """
+    time = df["TIME"].to_numpy(dtype="datetime64[ns]")
+    lo = 0 if start is None else np.searchsorted(time, np.datetime64(start), "left")
+    hi = (
+        len(time) if end is None else np.searchsorted(time, np.datetime64(end), "right")
+    )
+    time = time[lo:hi]
+    x = time.astype(np.int64).astype(np.float64)
+
+    parts = []
+    for column in columns:
+        y = df[column].to_numpy(dtype=np.float64)[lo:hi]
+        keep = lttb_indices(x, y, points)
+        parts.append(
+            pd.DataFrame({"TIME": time[keep], "series": column, "value": y[keep]})
+        )
+    if not parts:
+        return pd.DataFrame(columns=["TIME", "series", "value"])
+    return pd.concat(parts, ignore_index=True)
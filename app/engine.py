@@ -0,0 +1,623 @@
+from __future__ import annotations
+
+import os
+import warnings
+from typing import Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    import numba
+except ImportError:  # numba は任意依存（無ければ Python ループで実行）
+    numba = None
+
+# 実行バックエンド（引数で未指定なら環境変数 GREENNAVI_BACKEND を参照）
+BACKEND_ENV_VAR = "GREENNAVI_BACKEND"
+# "vectorized" は蓄電池のみシナリオ専用（ループを使わない配列演算）
+BACKENDS = ("auto", "numba", "python", "vectorized")
+
+# 月ごとの水素モード
+MONTH_OTHER = 0
+MONTH_PRODUCTION = 1
+MONTH_CONSUMPTION = 2
+
+# 出力配列の行番号（列名は BATTERY_COLUMNS / HYDROGEN_COLUMNS と同じ順）
+COST = 0
+BATT_SOC = 1
+CHARGE = 2
+DISCHARGE = 3
+BUY = 4
+SELL = 5
+REMAIN_SURPLUS = 6
+H2_STORAGE = 7
+H2_ENERGY = 8
+EL_INPUT = 9
+FC_OUTPUT = 10
+BUY_BEFORE_H2 = 11
+
+BATTERY_COLUMNS = (
+    "cost",
+    "batt_soc_kwh",
+    "charge",
+    "discharge",
+    "buy_electricity",
+    "sell_electricity",
+)
+HYDROGEN_COLUMNS = BATTERY_COLUMNS + (
+    "remain_surplus",
+    "h2_storage_kwh",
+    "h2_energy_kwh",
+    "el_input_used_kwh",
+    "fc_output_used_kwh",
+    "buy_before_h2",
+)
+# 蓄電池段の出力（水素の層に入る前の売電 = 余剰、買電 = 不足分）
+DISPATCH_COLUMNS = BATTERY_COLUMNS[1:]
+# 水素の層が書き込む列（蓄電池の SOC・充放電は蓄電池段の配列をそのまま使う）
+LAYER_COLUMNS = HYDROGEN_COLUMNS[BUY:]
+
+# カーネルが書かない行の代わりに置く空配列
+_UNUSED_ROW = np.empty(0)
+
+
+def month_code_table(
+    production_month: Sequence[int],
+    consumption_month: Sequence[int],
+) -> np.ndarray:
+    """
+    Lookup table indexed by month number (1-12) giving its MONTH_* code.
+    """
+    table = np.full(13, MONTH_OTHER, dtype=np.int8)
+    for month in range(1, 13):
+        if month in production_month:
+            table[month] = MONTH_PRODUCTION
+        elif month in consumption_month:
+            table[month] = MONTH_CONSUMPTION
+    return table
+
+
+def as_datetime(time: pd.Series) -> pd.Series:
+    """
+    ``pd.to_datetime`` that returns already parsed columns untouched.
+    """
+    if pd.api.types.is_datetime64_any_dtype(time):
+        return time
+    return pd.to_datetime(time)
+
+
+def month_codes(
+    time: pd.Series,
+    production_month: Sequence[int],
+    consumption_month: Sequence[int],
+) -> np.ndarray:
+    """
+    Map every row to MONTH_PRODUCTION / MONTH_CONSUMPTION / MONTH_OTHER.
+    """
+    table = month_code_table(production_month, consumption_month)
+    return table[time.dt.month.to_numpy(dtype=np.int64)]
+
+
+def infer_step_hours(time: pd.Series) -> float:
+    """
+    Typical row spacing of ``time`` in hours (median of the positive gaps),
+    or 1.0 when it cannot be determined.
+
+    Rated powers are given in kW; multiplying by this gives the energy the
+    battery, electrolyzer and fuel cell can move per row.
+    """
+    if len(time) < 2:
+        return 1.0
+    values = time.to_numpy(dtype="datetime64[ns]")
+    gaps = np.diff(values)
+    gaps = gaps[gaps > np.timedelta64(0, "ns")]
+    if len(gaps) == 0:
+        return 1.0
+    return float(np.median(gaps.astype(np.int64))) / 3.6e12
+
+
+def initial_battery_capacity(df: pd.DataFrame, default: float) -> float:
+    if "batt_soc_kwh" in df.columns:
+        return float(df["batt_soc_kwh"].iat[0])
+    return float(default)
+
+
+def _output_rows(n: int, first: int, last: int) -> tuple[np.ndarray, ...]:
+    """
+    Kernel output indexed by row number (``COST`` ...): one contiguous
+    float64 array per row ``first`` .. ``last`` and an empty placeholder for
+    the rows the kernel does not write, so nothing is allocated for them.
+    """
+    return tuple(
+        np.zeros(n) if row >= first else _UNUSED_ROW for row in range(last + 1)
+    )
+
+
+def _dispatch_battery(
+    load,
+    pv,
+    battery_capacity,
+    max_battery_capacity,
+    battery_rated_power_kwh,
+    out,
+):
+    """
+    Stage 1: hour-by-hour battery dispatch written against plain sequences.
+
+    The branches mirror ``_step_battery_only`` / ``_cost_and_battery_capacity``
+    one to one. ``out[SELL]`` receives the surplus left after charging and
+    ``out[BUY]`` the shortage left after discharging, i.e. the flows before
+    any hydrogen layer. Row 0 only holds the initial state.
+    """
+    n = len(load)
+    if n == 0:
+        return
+
+    out[BATT_SOC][0] = battery_capacity
+
+    for i in range(1, n):
+        load_i = load[i]
+        pv_i = pv[i]
+
+        battery_space = max_battery_capacity - battery_capacity
+
+        charge = 0.0
+        discharge = 0.0
+        buy_electricity = 0.0
+        remain_surplus = 0.0
+
+        if pv_i >= load_i:
+            surplus = pv_i - load_i
+            if surplus >= battery_rated_power_kwh:
+                if battery_space >= battery_rated_power_kwh:
+                    charge = battery_rated_power_kwh
+                    remain_surplus = surplus - battery_rated_power_kwh
+                else:
+                    charge = battery_space
+                    remain_surplus = surplus - battery_space
+            else:
+                if battery_space >= surplus:
+                    charge = surplus
+                else:
+                    charge = battery_space
+                    remain_surplus = surplus - battery_space
+        else:
+            shortage = load_i - pv_i
+            if shortage >= battery_rated_power_kwh:
+                if battery_capacity >= battery_rated_power_kwh:
+                    discharge = battery_rated_power_kwh
+                    buy_electricity = shortage - battery_rated_power_kwh
+                else:
+                    discharge = battery_capacity
+                    buy_electricity = shortage - battery_capacity
+            else:
+                if battery_capacity >= shortage:
+                    discharge = shortage
+                else:
+                    discharge = battery_capacity
+                    buy_electricity = shortage - battery_capacity
+
+        battery_capacity = battery_capacity + charge - discharge
+        if battery_capacity > max_battery_capacity:
+            battery_capacity = max_battery_capacity
+        if battery_capacity < 0:
+            battery_capacity = 0.0
+
+        out[BATT_SOC][i] = battery_capacity
+        out[CHARGE][i] = charge
+        out[DISCHARGE][i] = discharge
+        out[BUY][i] = buy_electricity
+        out[SELL][i] = remain_surplus
+
+
+def _hydrogen_layer(
+    remain_surplus_in,
+    buy_before_h2_in,
+    month_code,
+    h2_storage_kwh,
+    el_rated_power_kwh,
+    el_efficiency,
+    h2_storage_capacity_kwh,
+    fc_rated_power_kwh,
+    fc_efficiency,
+    out,
+):
+    """
+    Stage 2: electrolyzer / H2 store / fuel cell on top of the battery flows.
+
+    Consumes the surplus and shortage left by ``_dispatch_battery`` (its
+    ``SELL`` / ``BUY`` rows) and writes the hydrogen rows plus the ``SELL`` /
+    ``BUY`` left after the hydrogen system. The battery never depends on
+    this layer, so its dispatch can be shared with the battery-only scenario.
+    """
+    n = len(remain_surplus_in)
+    if n == 0:
+        return
+
+    out[H2_STORAGE][0] = h2_storage_kwh
+
+    for i in range(1, n):
+        remain_surplus = remain_surplus_in[i]
+        buy_electricity = buy_before_h2_in[i]
+
+        sell_electricity = 0.0
+        h2_energy_kwh = 0.0
+        el_input_used_kwh = 0.0
+        fc_output_used_kwh = 0.0
+        buy_before_h2 = buy_electricity
+        code = month_code[i]
+
+        if code == MONTH_PRODUCTION:
+            if remain_surplus > 0:
+                h2_storage_space_kwh = h2_storage_capacity_kwh - h2_storage_kwh
+                h2_storage_space_kwh = max(h2_storage_space_kwh, 0.0)
+                if h2_storage_space_kwh > 0:
+                    storage_limit_kwh = h2_storage_space_kwh / el_efficiency
+                    el_input_used_kwh = min(
+                        remain_surplus, el_rated_power_kwh, storage_limit_kwh
+                    )
+
+                    h2_energy_kwh = el_input_used_kwh * el_efficiency
+                    h2_storage_kwh = min(
+                        h2_storage_kwh + h2_energy_kwh, h2_storage_capacity_kwh
+                    )
+                    sell_electricity = max(remain_surplus - el_input_used_kwh, 0.0)
+                else:
+                    sell_electricity = remain_surplus
+
+        elif code == MONTH_CONSUMPTION:
+            if remain_surplus > 0:
+                sell_electricity = remain_surplus
+
+            if buy_electricity > 0 and h2_storage_kwh > 0:
+                fc_possible_by_storage = h2_storage_kwh * fc_efficiency
+                fc_possible = min(fc_rated_power_kwh, fc_possible_by_storage)
+
+                fc_output_used_kwh = min(buy_electricity, fc_possible)
+                if fc_output_used_kwh > 0:
+                    h2_consumed_kwh = fc_output_used_kwh / fc_efficiency
+                    h2_storage_kwh = max(h2_storage_kwh - h2_consumed_kwh, 0.0)
+                    buy_electricity -= fc_output_used_kwh
+
+        out[BUY][i] = buy_electricity
+        out[SELL][i] = sell_electricity
+        out[REMAIN_SURPLUS][i] = remain_surplus
+        out[H2_STORAGE][i] = h2_storage_kwh
+        out[H2_ENERGY][i] = h2_energy_kwh
+        out[EL_INPUT][i] = el_input_used_kwh
+        out[FC_OUTPUT][i] = fc_output_used_kwh
+        out[BUY_BEFORE_H2][i] = buy_before_h2
+
+
+# Numba でコンパイル済みのカーネル（初回使用時に作る）
+_numba_kernels: dict[str, object] = {}
+
+
+def numba_available() -> bool:
+    return numba is not None
+
+
+def resolve_backend(backend: str | None = None, hydrogen: bool = False) -> str:
+    """
+    Return the backend that will actually run.
+
+    ``backend`` falls back to the ``GREENNAVI_BACKEND`` environment variable
+    and then to ``"auto"``, which picks Numba whenever it is installed.
+    ``"vectorized"`` only exists for the battery-only scenario; the hydrogen
+    scenario treats it as ``"auto"``.
+    """
+    requested = (backend or os.getenv(BACKEND_ENV_VAR) or "auto").strip().lower()
+    if requested not in BACKENDS:
+        raise ValueError(
+            f"unknown backend {requested!r}; expected one of {', '.join(BACKENDS)}"
+        )
+
+    if requested == "vectorized":
+        if not hydrogen:
+            return "vectorized"
+        requested = "auto"
+
+    if requested == "python":
+        return "python"
+    if numba_available():
+        return "numba"
+    if requested == "numba":
+        warnings.warn(
+            "numba is not installed; falling back to the python backend",
+            RuntimeWarning,
+            stacklevel=3,
+        )
+    return "python"
+
+
+def _get_numba(kernel):
+    compiled = _numba_kernels.get(kernel.__name__)
+    if compiled is None:
+        # cache=True でコンパイル結果を __pycache__ に保存し、再起動後も再利用する
+        compiled = numba.njit(cache=True, nogil=True)(kernel)
+        _numba_kernels[kernel.__name__] = compiled
+    return compiled
+
+
+def _bounded_scan(delta: np.ndarray, initial: float, upper: float) -> np.ndarray:
+    """
+    Evaluate ``x[t] = clip(x[t-1] + delta[t], 0, upper)`` for every ``t``.
+
+    Each step is a map ``x -> min(max(x + a, lo), hi)`` and the composition of
+    two such maps has the same form, so the recurrence is an associative scan.
+    It is evaluated with log2(n) whole-array passes (Hillis-Steele). Once a
+    prefix map is flat (``lo == hi``, i.e. the battery hit empty or full) it no
+    longer depends on earlier steps, so later passes only touch the rest.
+    """
+    a = np.array(delta, dtype=np.float64)
+    lo = np.zeros_like(a)
+    hi = np.full_like(a, upper)
+
+    n = len(a)
+    shift = 1
+    active = None
+    while shift < n:
+        if active is None:
+            m = n - shift
+            a_cur, lo_cur, hi_cur = a[shift:], lo[shift:], hi[shift:]
+            new_hi = np.minimum(np.maximum(hi[:m] + a_cur, lo_cur), hi_cur)
+            new_lo = np.minimum(np.maximum(lo[:m] + a_cur, lo_cur), new_hi)
+            a[shift:] += a[:m]
+            lo[shift:] = new_lo
+            hi[shift:] = new_hi
+            shift *= 2
+
+            # 未確定の要素が 1 割を切ったら、その要素だけを添字で更新する
+            is_open = lo[shift:] < hi[shift:]
+            if np.count_nonzero(is_open) < 0.1 * len(is_open):
+                active = np.flatnonzero(is_open) + shift
+        else:
+            active = active[active >= shift]
+            if len(active) == 0:
+                break
+            prev = active - shift
+            a_cur, lo_cur, hi_cur = a[active], lo[active], hi[active]
+            new_hi = np.minimum(np.maximum(hi[prev] + a_cur, lo_cur), hi_cur)
+            new_lo = np.minimum(np.maximum(lo[prev] + a_cur, lo_cur), new_hi)
+            a[active] = a[prev] + a_cur
+            lo[active] = new_lo
+            hi[active] = new_hi
+            shift *= 2
+            active = active[new_lo < new_hi]
+
+    return np.minimum(np.maximum(initial + a, lo), hi)
+
+
+def _simulate_battery_vectorized(
+    load: np.ndarray,
+    pv: np.ndarray,
+    battery_capacity: float,
+    max_battery_capacity: float,
+    battery_rated_power_kwh: float,
+    out: np.ndarray,
+) -> None:
+    """
+    Loop-free battery-only dispatch; matches ``_dispatch_battery`` up to rounding.
+    """
+    n = len(load)
+    if n == 0:
+        return
+
+    out[BATT_SOC][0] = battery_capacity
+    if n < 2:
+        return
+
+    load = load[1:]
+    pv = pv[1:]
+    is_surplus = pv >= load
+    surplus = np.where(is_surplus, pv - load, 0.0)
+    shortage = np.where(is_surplus, 0.0, load - pv)
+    # load/pv が NaN の時間は元のループ同様に蓄電池を空にする
+    is_missing = np.isnan(shortage)
+
+    delta = np.where(
+        is_surplus,
+        np.minimum(surplus, battery_rated_power_kwh),
+        -np.minimum(shortage, battery_rated_power_kwh),
+    )
+    delta[is_missing] = -np.inf
+
+    soc = _bounded_scan(delta, battery_capacity, max_battery_capacity)
+    soc_prev = np.empty_like(soc)
+    soc_prev[0] = battery_capacity
+    soc_prev[1:] = soc[:-1]
+
+    charge = np.where(
+        is_surplus,
+        np.minimum(
+            np.minimum(surplus, battery_rated_power_kwh),
+            max_battery_capacity - soc_prev,
+        ),
+        0.0,
+    )
+    discharge = np.where(
+        is_missing,
+        soc_prev,
+        np.minimum(np.minimum(shortage, battery_rated_power_kwh), soc_prev),
+    )
+
+    out[BATT_SOC][1:] = soc
+    out[CHARGE][1:] = charge
+    out[DISCHARGE][1:] = discharge
+    out[BUY][1:] = shortage - discharge
+    out[SELL][1:] = surplus - charge
+
+
+def dispatch_battery(
+    load: np.ndarray,
+    pv: np.ndarray,
+    initial_battery_capacity: float,
+    *,
+    max_battery_capacity: float,
+    battery_rated_power_kwh: float,
+    hydrogen: bool = False,
+    backend: str | None = None,
+) -> tuple[dict[str, np.ndarray], str]:
+    """
+    Battery stage on plain arrays (``DISPATCH_COLUMNS``, no cost).
+
+    ``sell_electricity`` / ``buy_electricity`` are the surplus and shortage
+    left after the battery, i.e. the input of ``apply_hydrogen``.
+    ``hydrogen`` only matters for resolving ``backend`` (see
+    ``resolve_backend``), so both scenarios get the same numbers.
+    """
+    n = len(load)
+    out = _output_rows(n, BATT_SOC, SELL)
+
+    backend_used = resolve_backend(backend, hydrogen)
+    load = np.ascontiguousarray(load, dtype=np.float64)
+    pv = np.ascontiguousarray(pv, dtype=np.float64)
+
+    if backend_used == "vectorized":
+        _simulate_battery_vectorized(
+            load,
+            pv,
+            float(initial_battery_capacity),
+            float(max_battery_capacity),
+            float(battery_rated_power_kwh),
+            out,
+        )
+    else:
+        if backend_used == "numba":
+            dispatch = _get_numba(_dispatch_battery)
+        else:
+            # 要素アクセスは ndarray よりリストの方が速い
+            dispatch = _dispatch_battery
+            load, pv = load.tolist(), pv.tolist()
+
+        dispatch(
+            load,
+            pv,
+            float(initial_battery_capacity),
+            float(max_battery_capacity),
+            float(battery_rated_power_kwh),
+            out,
+        )
+
+    return dict(zip(DISPATCH_COLUMNS, out[BATT_SOC:])), backend_used
+
+
+def apply_hydrogen(
+    flows: Mapping[str, np.ndarray],
+    month_code: np.ndarray,
+    *,
+    initial_h2_storage_kwh: float = 0.0,
+    el_rated_power_kwh: float = 0.0,
+    el_efficiency: float = 1.0,
+    h2_storage_capacity_kwh: float = 0.0,
+    fc_rated_power_kwh: float = 0.0,
+    fc_efficiency: float = 1.0,
+    backend: str | None = None,
+) -> tuple[dict[str, np.ndarray], str]:
+    """
+    Hydrogen stage: run the electrolyzer / H2 store / fuel cell on the
+    output of ``dispatch_battery``.
+
+    ``flows`` is not modified. Returns ``HYDROGEN_COLUMNS`` without cost;
+    the battery SOC and charge / discharge arrays are those of ``flows``.
+    """
+    n = len(flows["batt_soc_kwh"])
+    out = _output_rows(n, BUY, BUY_BEFORE_H2)
+
+    backend_used = resolve_backend(backend, hydrogen=True)
+    remain_surplus = np.ascontiguousarray(flows["sell_electricity"], np.float64)
+    buy_before_h2 = np.ascontiguousarray(flows["buy_electricity"], np.float64)
+    month_code = np.ascontiguousarray(month_code, dtype=np.int8)
+    if backend_used == "numba":
+        layer = _get_numba(_hydrogen_layer)
+    else:
+        layer = _hydrogen_layer
+        remain_surplus, buy_before_h2, month_code = (
+            remain_surplus.tolist(),
+            buy_before_h2.tolist(),
+            month_code.tolist(),
+        )
+
+    layer(
+        remain_surplus,
+        buy_before_h2,
+        month_code,
+        float(initial_h2_storage_kwh),
+        float(el_rated_power_kwh),
+        float(el_efficiency),
+        float(h2_storage_capacity_kwh),
+        float(fc_rated_power_kwh),
+        float(fc_efficiency),
+        out,
+    )
+    battery = {name: flows[name] for name in HYDROGEN_COLUMNS[BATT_SOC:BUY]}
+    return {**battery, **dict(zip(LAYER_COLUMNS, out[BUY:]))}, backend_used
+
+
+def apply_costing(
+    flows: Mapping[str, np.ndarray], buy_price: float, sell_price: float
+) -> dict[str, np.ndarray]:
+    """
+    Costing stage: prepend the ``cost`` column to the energy flows.
+
+    Row 0 only holds the initial state and costs nothing.
+    """
+    cost = flows["buy_electricity"] * buy_price - flows["sell_electricity"] * sell_price
+    if len(cost):
+        cost[0] = 0.0
+    return {"cost": cost, **flows}
+
+
+def simulate_arrays(
+    load: np.ndarray,
+    pv: np.ndarray,
+    initial_battery_capacity: float,
+    *,
+    max_battery_capacity: float,
+    battery_rated_power_kwh: float,
+    buy_price: float | None = None,
+    sell_price: float | None = None,
+    hydrogen: bool = False,
+    month_code: np.ndarray | None = None,
+    initial_h2_storage_kwh: float = 0.0,
+    el_rated_power_kwh: float = 0.0,
+    el_efficiency: float = 1.0,
+    h2_storage_capacity_kwh: float = 0.0,
+    fc_rated_power_kwh: float = 0.0,
+    fc_efficiency: float = 1.0,
+    backend: str | None = None,
+) -> tuple[dict[str, np.ndarray], str]:
+    """
+    Run either scenario on plain arrays: battery dispatch, the hydrogen
+    layer when ``hydrogen`` is set, then costing.
+
+    Returns one array per output column and the name of the backend that
+    ran. Without prices the ``cost`` column is left out.
+    """
+    if hydrogen and month_code is None:
+        raise ValueError("month_code is required for the hydrogen scenario")
+
+    flows, backend_used = dispatch_battery(
+        load,
+        pv,
+        initial_battery_capacity,
+        max_battery_capacity=max_battery_capacity,
+        battery_rated_power_kwh=battery_rated_power_kwh,
+        hydrogen=hydrogen,
+        backend=backend,
+    )
+    if hydrogen:
+        flows, _ = apply_hydrogen(
+            flows,
+            month_code,
+            initial_h2_storage_kwh=initial_h2_storage_kwh,
+            el_rated_power_kwh=el_rated_power_kwh,
+            el_efficiency=el_efficiency,
+            h2_storage_capacity_kwh=h2_storage_capacity_kwh,
+            fc_rated_power_kwh=fc_rated_power_kwh,
+            fc_efficiency=fc_efficiency,
+            backend=backend,
+        )
+    if buy_price is None or sell_price is None:
+        return flows, backend_used
+    return apply_costing(flows, buy_price, sell_price), backend_used
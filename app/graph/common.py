@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import io
+import os
+from typing import Callable
+
+import altair as alt
+import japanize_matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import streamlit as st
+from matplotlib.figure import Figure
+
+from app.cache import LRUCache, fingerprint_frame
+from app.summary import MONTHLY_SUM_COLUMNS, monthly_frame, monthly_sums
+
+# st.pyplot と同じ保存設定
+SAVEFIG_OPTIONS = {"format": "png", "dpi": 200, "bbox_inches": "tight"}
+# Streamlit が表示する画像の最大幅 (px)。これより大きいと表示のたびに縮小される
+MAX_IMAGE_WIDTH = 1460
+
+# グラフの描画方法: ブラウザ側 (Vega-Lite) か、サーバ側の matplotlib 画像か
+CHART_RENDERERS = {
+    "altair": "ブラウザで描画（高速）",
+    "matplotlib": "matplotlib（画像）",
+}
+CHART_RENDERER_ENV_VAR = "GREENNAVI_CHART_RENDERER"
+
+
+def resolve_chart_renderer(renderer: str | None = None) -> str:
+    """
+    Chart renderer to use: ``renderer``, else ``GREENNAVI_CHART_RENDERER``,
+    else ``"altair"``.
+    """
+    requested = renderer or os.getenv(CHART_RENDERER_ENV_VAR) or "altair"
+    if requested not in CHART_RENDERERS:
+        source = "" if renderer else f" ({CHART_RENDERER_ENV_VAR})"
+        raise ValueError(
+            f"unknown chart renderer {requested!r}{source}; "
+            f"expected one of {', '.join(CHART_RENDERERS)}"
+        )
+    return requested
+
+
+# 読み込み時に検証する（不正な値ではサイドバーを作る前に理由付きで止まる）
+DEFAULT_CHART_RENDERER = resolve_chart_renderer()
+
+# 描画済みグラフ（PNG）と月別集計のキャッシュ件数（環境変数で変更可）
+FIGURE_CACHE_SIZE = int(os.getenv("GREENNAVI_FIGURE_CACHE_SIZE", "32"))
+
+monthly_cache = LRUCache(FIGURE_CACHE_SIZE)
+figure_cache = LRUCache(FIGURE_CACHE_SIZE)
+
+
+def monthly_totals(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Monthly sums of every ``MONTHLY_SUM_COLUMNS`` column present in ``df``,
+    indexed by month in fiscal order (April first).
+
+    Months without data are reported as 0, so partial-year results plot
+    fine. NaN values are skipped like ``groupby().sum()`` does.
+    """
+    month = df["TIME"].dt.month.to_numpy()
+    return monthly_frame(
+        {
+            column: monthly_sums(month, df[column].to_numpy(dtype=np.float64))
+            for column in MONTHLY_SUM_COLUMNS
+            if column in df.columns
+        }
+    )
+
+
+def shared_monthly_totals(
+    df: pd.DataFrame, fingerprint: str | None = None
+) -> pd.DataFrame:
+    """
+    ``monthly_totals`` computed once per result (keyed by its fingerprint)
+    and shared by every chart.
+
+    Cached results are keyed by their energy flows only, so a tariff change
+    reuses the totals and the rendered charts.
+    """
+    if fingerprint is None:
+        fingerprint = fingerprint_frame(df, stage="charts")
+    return monthly_cache.get_or_compute(fingerprint, lambda: monthly_totals(df))
+
+
+def monthly_bar_figure(values: pd.Series, ylabel: str, title: str) -> Figure:
+    """
+    Bar chart of one monthly series with the value printed above each bar.
+    """
+    # 棒を描く位置は 0〜11 の連番にする
+    x = range(len(values))
+
+    fig, ax = plt.subplots(figsize=(12, 5))
+    bars = ax.bar(x, values.to_numpy(), color="lightgreen")
+
+    # 値の表示（棒の上に少し離して置く。値が 0 ばかりでも軸が崩れない）
+    ax.bar_label(bars, fmt="{:.1f}", padding=2)
+
+    ax.set_xlabel("月")
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.grid(True)
+    ax.set_xticks(x, values.index)
+    fig.tight_layout()
+    return fig
+
+
+def render_monthly_figure(
+    name: str,
+    df: pd.DataFrame,
+    draw: Callable[[pd.DataFrame], Figure],
+) -> None:
+    """
+    Show the chart ``draw(monthly_totals)`` for the result ``df``.
+
+    The rendered PNG is cached per chart name and result fingerprint, so
+    reruns with an unchanged result skip both aggregation and drawing. The
+    figure is closed right after rendering.
+    """
+
+    fingerprint = fingerprint_frame(df, stage="charts")
+
+    def render() -> bytes:
+        fig = draw(shared_monthly_totals(df, fingerprint))
+        try:
+            buffer = io.BytesIO()
+            dpi = min(SAVEFIG_OPTIONS["dpi"], MAX_IMAGE_WIDTH / fig.get_figwidth())
+            fig.savefig(buffer, **{**SAVEFIG_OPTIONS, "dpi": dpi})
+            return buffer.getvalue()
+        finally:
+            plt.close(fig)
+
+    png = figure_cache.get_or_compute((name, fingerprint), render)
+    st.image(png, width="stretch", output_format="PNG")
+
+
+def _month_labels(index: pd.Index) -> list[str]:
+    return [str(month) for month in index]
+
+
+def monthly_bar_chart(values: pd.Series, ylabel: str, title: str) -> alt.Chart:
+    """
+    Vega-Lite version of ``monthly_bar_figure`` (12 rows sent to the browser).
+    """
+    months = _month_labels(values.index)
+    data = pd.DataFrame({"month": months, "value": values.to_numpy()})
+    base = alt.Chart(data, title=title).encode(
+        x=alt.X("month:N", sort=months, title="月", axis=alt.Axis(labelAngle=0)),
+        y=alt.Y("value:Q", title=ylabel),
+    )
+    bars = base.mark_bar(color="lightgreen").encode(
+        tooltip=[
+            alt.Tooltip("month:N", title="月"),
+            alt.Tooltip("value:Q", title=ylabel, format=".1f"),
+        ]
+    )
+    labels = base.mark_text(baseline="bottom", dy=-2).encode(
+        text=alt.Text("value:Q", format=".1f")
+    )
+    return bars + labels
+
+
+def monthly_stacked_chart(
+    monthly: pd.DataFrame,
+    parts: dict[str, tuple[str, str]],
+    ylabel: str,
+    title: str,
+) -> alt.Chart:
+    """
+    Stacked monthly bars; ``parts`` maps a column to ``(label, color)`` from
+    the bottom of the stack up. Missing columns are drawn as 0.
+    """
+    months = _month_labels(monthly.index)
+    labels = [label for label, _ in parts.values()]
+    data = pd.DataFrame(
+        {
+            "month": np.tile(months, len(parts)),
+            "part": np.repeat(labels, len(months)),
+            "order": np.repeat(np.arange(len(parts)), len(months)),
+            "value": np.concatenate(
+                [
+                    (
+                        monthly[column].to_numpy()
+                        if column in monthly.columns
+                        else np.zeros(len(monthly))
+                    )
+                    for column in parts
+                ]
+            ),
+        }
+    )
+    return (
+        alt.Chart(data, title=title)
+        .mark_bar()
+        .encode(
+            x=alt.X("month:N", sort=months, title="月", axis=alt.Axis(labelAngle=0)),
+            y=alt.Y("value:Q", stack="zero", title=ylabel),
+            color=alt.Color(
+                "part:N",
+                sort=labels,
+                scale=alt.Scale(
+                    domain=labels, range=[color for _, color in parts.values()]
+                ),
+                legend=alt.Legend(title=None),
+            ),
+            order=alt.Order("order:Q"),
+            tooltip=[
+                alt.Tooltip("month:N", title="月"),
+                alt.Tooltip("part:N", title="内訳"),
+                alt.Tooltip("value:Q", title=ylabel, format=".1f"),
+            ],
+        )
+    )
+
+
+def render_monthly_chart(
+    name: str,
+    df: pd.DataFrame,
+    draw: Callable[[pd.DataFrame], Figure],
+    chart: Callable[[pd.DataFrame], alt.Chart],
+    renderer: str | None = None,
+) -> None:
+    """
+    Show a monthly chart of the result ``df`` with the chosen renderer.
+
+    ``"altair"`` sends the 12-row monthly table to the browser as a
+    Vega-Lite spec; ``"matplotlib"`` rasterizes ``draw`` on the server
+    (see ``render_monthly_figure``), e.g. for static export.
+    """
+    renderer = renderer or DEFAULT_CHART_RENDERER
+    if renderer not in CHART_RENDERERS:
+        raise ValueError(f"未対応の描画方法です: {renderer}")
+    if renderer == "matplotlib":
+        render_monthly_figure(name, df, draw)
+        return
+    st.altair_chart(chart(shared_monthly_totals(df)), width="stretch")
@@ -1,56 +1,54 @@
-import japanize_matplotlib
+import altair as alt
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-import streamlit as st
+from matplotlib.figure import Figure
 
+from app.graph.common import monthly_stacked_chart, render_monthly_chart
+from app.instrument import instrumented
 
-def plot_repair_the_cottage(df: pd.DataFrame):
-    df_copy = df.copy()
-    df_copy["month"] = df_copy["TIME"].dt.month
+TITLE = "コテージ不足電力を何で補ったか（月別・4月スタート）"
+# 積み上げの順（下から）: 列 -> (凡例, 色)
+PARTS = {
+    "discharge": ("バッテリー放電量", "lightskyblue"),
+    "fc_output_used_kwh": ("燃料電池出力", "lightgreen"),
+    "buy_electricity": ("買電量", "gold"),
+}
 
-    # PVで賄えなかった不足（PVの後ろの不足）
-    df_copy["shortage_after_pv"] = (
-        df_copy["load_site_kwh"] - df_copy["pv_net_pos_kwh"]
-    ).clip(lower=0)
 
-    # 月別集計（kWh）
-    monthly = df_copy.groupby("month").agg(
-        shortage_after_pv=("shortage_after_pv", "sum"),
-        battery_discharge=("discharge", "sum"),
-        fc_output=("fc_output_used_kwh", "sum"),
-        grid_buy=("buy_electricity", "sum"),
-    )
+def _draw(monthly: pd.DataFrame) -> Figure:
+    x = list(range(len(monthly)))
 
-    # ★ 4月スタート順に並べ替え
-    order = [4, 5, 6, 7, 8, 9, 10, 11, 12, 1, 2, 3]
-    monthly = monthly.loc[order]
-    x = list(range(len(order)))
+    fig, ax = plt.subplots(figsize=(10, 8))
 
-    # NumPy配列にして stacked bar の bottom に使う
-    months = monthly.index.values
-    batt = monthly["battery_discharge"].values
-    fc = monthly["fc_output"].values
-    grid = monthly["grid_buy"].values
+    # バッテリー → 燃料電池 → 買電 の順に積み上げる
+    # （蓄電池のみの結果には燃料電池の列が無いので 0 とする）
+    bottom = np.zeros(len(monthly))
+    for column, (label, color) in PARTS.items():
+        if column in monthly.columns:
+            values = monthly[column].to_numpy()
+        else:
+            values = np.zeros(len(monthly))
+        ax.bar(x, values, bottom=bottom, label=label, color=color)
+        bottom = bottom + values
 
-    plt.figure(figsize=(10, 8))
+    ax.set_xlabel("月")
+    ax.set_ylabel("電力量 (kWh)")
+    ax.set_title(TITLE)
 
-    # バッテリー
-    plt.bar(x, batt, label="バッテリー放電量", color="lightskyblue")
+    # x軸は年度順
+    ax.set_xticks(x, monthly.index)
 
-    # 燃料電池（バッテリーの上に積む）
-    plt.bar(x, fc, bottom=batt, label="燃料電池出力", color="lightgreen")
+    ax.legend()
+    ax.grid(True)
+    fig.tight_layout()
+    return fig
 
-    # 買電（バッテリー＋FCの上に積む）
-    plt.bar(x, grid, bottom=batt + fc, label="買電量", color="gold")
 
-    plt.xlabel("月")
-    plt.ylabel("電力量 (kWh)")
-    plt.title("コテージ不足電力を何で補ったか（月別・4月スタート）")
+def _chart(monthly: pd.DataFrame) -> alt.Chart:
+    return monthly_stacked_chart(monthly, PARTS, "電力量 (kWh)", TITLE)
 
-    # ★ x軸も年度順に修正
-    plt.xticks(x, months)
 
-    plt.legend()
-    plt.grid(True)
-    plt.tight_layout()
-    st.pyplot(plt)
+@instrumented()
+def plot_repair_the_cottage(df: pd.DataFrame, renderer: str | None = None):
+    render_monthly_chart("repair_the_cottage", df, _draw, _chart, renderer)
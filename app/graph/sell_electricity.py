@@ -1,39 +1,26 @@
-import japanize_matplotlib
-import matplotlib.pyplot as plt
+import altair as alt
 import pandas as pd
-import streamlit as st
-
-
-def plot_sell_electricity(df: pd.DataFrame):
-    df_copy = df.copy()
-    df_copy["month"] = df_copy["TIME"].dt.month
-    monthly_sell = df_copy.groupby("month")["sell_electricity"].sum()
-
-    # 年度順に並べ替え（4→12→1→3）
-    order = [4, 5, 6, 7, 8, 9, 10, 11, 12, 1, 2, 3]
-    monthly_sell_ordered = monthly_sell.loc[order]
-    # ここがポイント：棒を描く位置は 0〜11 の連番にする
-    x = range(len(order))
-
-    plt.figure(figsize=(12, 5))
-    plt.bar(x, monthly_sell_ordered.values, color="lightgreen")
-
-    # 値の表示
-    for idx, value in enumerate(monthly_sell_ordered.values):
-        plt.text(
-            x=idx,  # ← x 座標は idx
-            y=value + 2,
-            s=f"{value:.1f}",
-            ha="center",
-            va="bottom",
-        )
-
-    plt.xlabel("月")
-    plt.ylabel("売電量 (kWh)")
-    plt.title("売電量の推移（4月スタート）")
-    plt.grid(True)
-
-    plt.xticks(x, order)
-
-    plt.tight_layout()
-    st.pyplot(plt)
+from matplotlib.figure import Figure
+
+from app.graph.common import (
+    monthly_bar_chart,
+    monthly_bar_figure,
+    render_monthly_chart,
+)
+from app.instrument import instrumented
+
+YLABEL = "売電量 (kWh)"
+TITLE = "売電量の推移（4月スタート）"
+
+
+def _draw(monthly: pd.DataFrame) -> Figure:
+    return monthly_bar_figure(monthly["sell_electricity"], YLABEL, TITLE)
+
+
+def _chart(monthly: pd.DataFrame) -> alt.Chart:
+    return monthly_bar_chart(monthly["sell_electricity"], YLABEL, TITLE)
+
+
+@instrumented()
+def plot_sell_electricity(df: pd.DataFrame, renderer: str | None = None):
+    render_monthly_chart("sell_electricity", df, _draw, _chart, renderer)
@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+import altair as alt
+import pandas as pd
+import streamlit as st
+
+from app.downsample import DEFAULT_POINTS, downsample_frame
+from app.instrument import span
+
+# 時系列表示できる列（結果に無い列は選択肢に出さない）
+TIMESERIES_LABELS = {
+    "batt_soc_kwh": "蓄電池残量 (kWh)",
+    "h2_storage_kwh": "水素貯蔵量 (kWh)",
+    "buy_electricity": "買電量 (kWh)",
+    "sell_electricity": "売電量 (kWh)",
+    "load_site_kwh": "負荷 (kWh)",
+    "pv_net_pos_kwh": "太陽光発電量 (kWh)",
+    "discharge": "バッテリー放電量 (kWh)",
+    "fc_output_used_kwh": "燃料電池出力 (kWh)",
+}
+DEFAULT_TIMESERIES = ("batt_soc_kwh", "h2_storage_kwh")
+POINT_OPTIONS = [500, 1000, DEFAULT_POINTS, 3000, 5000]
+
+
+def timeseries_chart(data: pd.DataFrame) -> alt.Chart:
+    """
+    Zoomable line chart of a long-format frame from ``downsample_frame``
+    (drag to pan, scroll to zoom the time axis).
+    """
+    labels = [TIMESERIES_LABELS.get(column, column) for column in data["series"]]
+    data = data.assign(series=labels)
+    return (
+        alt.Chart(data)
+        .mark_line(strokeWidth=1)
+        .encode(
+            x=alt.X("TIME:T", title="日時"),
+            y=alt.Y("value:Q", title="kWh"),
+            color=alt.Color("series:N", legend=alt.Legend(title=None, orient="top")),
+            tooltip=[
+                alt.Tooltip("TIME:T", title="日時", format="%Y/%m/%d %H:%M"),
+                alt.Tooltip("series:N", title="系列"),
+                alt.Tooltip("value:Q", title="値", format=".2f"),
+            ],
+        )
+        .interactive(bind_y=False)
+    )
+
+
+@st.fragment
+def plot_timeseries(df: pd.DataFrame, key: str = "timeseries"):
+    """
+    Interactive time series of selected result columns.
+
+    Only the range chosen with the slider is downsampled (LTTB) to the
+    selected number of points per series, so multi-year hourly or minute
+    results stay responsive. Runs as a fragment: changing the series or
+    the range does not rerun the simulation page.
+    """
+    columns = [column for column in TIMESERIES_LABELS if column in df.columns]
+    if not columns or len(df) < 2:
+        return
+
+    selected = st.multiselect(
+        "表示する系列",
+        options=columns,
+        default=[column for column in DEFAULT_TIMESERIES if column in columns],
+        format_func=TIMESERIES_LABELS.get,
+        key=f"{key}_columns",
+    )
+    if not selected:
+        st.info("表示する系列を選んでください")
+        return
+
+    first = df["TIME"].iloc[0].to_pydatetime()
+    last = df["TIME"].iloc[-1].to_pydatetime()
+    col_range, col_points = st.columns([4, 1])
+    with col_range:
+        start, end = st.slider(
+            "表示期間",
+            min_value=first,
+            max_value=last,
+            value=(first, last),
+            step=timedelta(hours=1),
+            format="YYYY/MM/DD HH:mm",
+            key=f"{key}_range",
+        )
+    with col_points:
+        points = st.select_slider(
+            "表示点数",
+            options=POINT_OPTIONS,
+            value=DEFAULT_POINTS,
+            key=f"{key}_points",
+            help="1 系列あたりブラウザに送る最大の点数です。",
+        )
+
+    with span("downsample_timeseries"):
+        data = downsample_frame(df, selected, start, end, points)
+    st.altair_chart(timeseries_chart(data), width="stretch")
+
+    visible = int(df["TIME"].between(start, end).sum())
+    st.caption(
+        f"表示期間 {visible:,} 点を 1 系列あたり最大 {points:,} 点に間引いて表示しています"
+        "（ドラッグで移動、ホイールで拡大縮小）。"
+    )
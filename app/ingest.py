@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.cache import LRUCache, register_fingerprint
+from app.instrument import instrumented
+
+# 保持する解析済みアップロードの件数（環境変数で変更可）
+UPLOAD_CACHE_SIZE = int(os.getenv("GREENNAVI_UPLOAD_CACHE_SIZE", "4"))
+
+# シミュレーションで使う数値列
+NUMERIC_COLUMNS = ("load_site_kwh", "pv_net_pos_kwh", "batt_soc_kwh")
+
+# 前処理ページが作る多解像度データ（<出力名>_pyramid フォルダ）の解像度
+PYRAMID_LEVEL_LABELS = {"1min": "1分", "15min": "15分", "hour": "1時間", "day": "1日"}
+PYRAMID_SUFFIXES = (".parquet", ".feather", ".csv")
+
+upload_cache = LRUCache(UPLOAD_CACHE_SIZE)
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def upload_format(file_name: str) -> str:
+    """
+    "parquet", "feather" or "csv", judged from the file extension.
+    """
+    suffix = Path(file_name).suffix.lower()
+    if suffix == ".parquet":
+        return "parquet"
+    if suffix in (".feather", ".arrow"):
+        return "feather"
+    return "csv"
+
+
+def parse_simulation_csv(source) -> pd.DataFrame:
+    """
+    Read a simulation CSV into the frame every page works on: ``TIME`` parsed
+    to datetime (unparseable rows dropped) and the numeric columns as float64.
+    """
+    return _normalize(pd.read_csv(source))
+
+
+@instrumented()
+def parse_simulation_file(source, file_name: str) -> pd.DataFrame:
+    """
+    Like ``parse_simulation_csv`` but also reads Parquet / Feather files,
+    whose typed columns (including a datetime ``TIME``) need no text parsing.
+    """
+    fmt = upload_format(file_name)
+    if fmt == "parquet":
+        return _normalize(pd.read_parquet(source))
+    if fmt == "feather":
+        return _normalize(pd.read_feather(source))
+    return parse_simulation_csv(source)
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    if "TIME" in df.columns:
+        if not pd.api.types.is_datetime64_any_dtype(df["TIME"]):
+            df["TIME"] = pd.to_datetime(df["TIME"], errors="coerce")
+        df = df.dropna(subset=["TIME"]).reset_index(drop=True)
+
+    for column in NUMERIC_COLUMNS:
+        if column in df.columns and pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = df[column].astype(np.float64)
+    return df
+
+
+def load_uploaded_file(uploaded_file) -> pd.DataFrame:
+    """
+    Parse an uploaded CSV / Parquet / Feather file once per content hash.
+
+    Streamlit reruns the whole script on every widget change; the parsed
+    frame is kept in ``upload_cache`` and the same object is returned for
+    the same bytes, so it must be treated as read-only. The content hash is
+    registered with ``app.cache`` so the simulation cache does not rehash
+    the frame either.
+    """
+    data = uploaded_file.getvalue()
+    digest = content_digest(data)
+
+    def parse() -> pd.DataFrame:
+        df = parse_simulation_file(io.BytesIO(data), uploaded_file.name)
+        register_fingerprint(df, digest)
+        return df
+
+    return upload_cache.get_or_compute(digest, parse)
+
+
+def load_data_file(path: Path) -> pd.DataFrame:
+    """
+    Parse a local data file once per (path, size, mtime), sharing the cache
+    and read-only contract of ``load_uploaded_file``.
+    """
+    path = Path(path)
+    stat = path.stat()
+    digest = content_digest(
+        f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}".encode()
+    )
+
+    def parse() -> pd.DataFrame:
+        df = parse_simulation_file(path, path.name)
+        register_fingerprint(df, digest)
+        return df
+
+    return upload_cache.get_or_compute(digest, parse)
+
+
+def find_pyramids(root: Path) -> list[Path]:
+    """
+    Multi-resolution folders written by the pretreatment page under ``root``.
+    """
+    root = Path(root)
+    if not root.is_dir():
+        return []
+    return sorted(path for path in root.glob("*_pyramid") if path.is_dir())
+
+
+def pyramid_levels(pyramid_dir: Path) -> dict[str, Path]:
+    """
+    Available resolutions of a pyramid folder, finest first.
+    """
+    levels = {}
+    for level in PYRAMID_LEVEL_LABELS:
+        for suffix in PYRAMID_SUFFIXES:
+            path = Path(pyramid_dir) / f"{level}{suffix}"
+            if path.exists():
+                levels[level] = path
+                break
+    return levels
+
+
+def load_selected_data(
+    settings: dict[str, object],
+) -> tuple[pd.DataFrame | None, str | None]:
+    """
+    The frame chosen in the sidebar and a name to show for it: the uploaded
+    file if any, otherwise the selected pyramid resolution.
+    """
+    uploaded_file = settings.get("uploaded_file")
+    if uploaded_file is not None:
+        return load_uploaded_file(uploaded_file), uploaded_file.name
+    pyramid_file = settings.get("pyramid_file")
+    if pyramid_file is not None:
+        path = Path(pyramid_file)
+        return load_data_file(path), f"{path.parent.name}/{path.name}"
+    return None, None
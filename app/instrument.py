@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import contextvars
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+
+import pandas as pd
+
+# アプリ全体のロガー名（preprocess は import 経路で __name__ が変わるため固定名）
+LOGGER_NAME = "greennavi"
+LOG_LEVEL_ENV_VAR = "GREENNAVI_LOG_LEVEL"
+PROFILE_TOP_N = 30
+
+logger = logging.getLogger(f"{LOGGER_NAME}.instrument")
+
+# 実行中の Recorder（Streamlit のセッションごと・スレッドごとに分かれる）
+_current: contextvars.ContextVar[Recorder | None] = contextvars.ContextVar(
+    "greennavi_recorder", default=None
+)
+
+# tracemalloc はプロセス全体で 1 つなので、使っている Recorder の数を数える
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+_tracemalloc_lock = threading.Lock()
+# ピークの取得・リセットもプロセス全体で 1 つなので、メモリを測る区間は
+# Recorder をまたいで最上位の区間ごとに直列化する（入れ子の区間は同じスレッド）
+_memory_span_lock = threading.RLock()
+
+
+def configure_logging(level: str | int | None = None) -> None:
+    """
+    Send ``greennavi.*`` records to stderr once per process.
+
+    The level defaults to ``GREENNAVI_LOG_LEVEL`` (``INFO`` when unset).
+    """
+    root = logging.getLogger(LOGGER_NAME)
+    if level is None:
+        level = os.getenv(LOG_LEVEL_ENV_VAR, "INFO")
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        )
+        root.addHandler(handler)
+        root.propagate = False
+
+
+@dataclass
+class Span:
+    name: str
+    seconds: float
+    depth: int = 0
+    peak_bytes: int | None = None
+
+
+@dataclass
+class Recorder:
+    """
+    Collects timing (and optionally peak traced memory) spans for one run.
+
+    ``memory=True`` turns on ``tracemalloc`` while the recorder is active,
+    which slows Python-level allocations down noticeably; ``profile=True``
+    also captures a cProfile of the whole run (see ``profile_text``).
+
+    The traced peak is process-wide, so the top-level spans of memory
+    recorders in different threads (Streamlit sessions) run one at a time
+    instead of resetting each other's peak. Allocations of threads that
+    are not being measured still count towards a span's peak.
+    """
+
+    memory: bool = False
+    profile: bool = False
+    spans: list[Span] = field(default_factory=list)
+    profile_text: str | None = None
+    _stack: list[list[int]] = field(default_factory=list, repr=False)
+    _profiler: cProfile.Profile | None = field(default=None, repr=False)
+
+    @contextmanager
+    def active(self) -> Iterator[Recorder]:
+        """
+        Make this recorder the target of ``span`` / ``instrumented`` calls.
+
+        May be entered several times (e.g. around separate parts of a page);
+        spans and the profile accumulate across activations.
+        """
+        token = _current.set(self)
+        if self.memory:
+            _start_tracemalloc()
+        profiling = False
+        if self.profile:
+            if self._profiler is None:
+                self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+                profiling = True
+            except ValueError:  # 別のプロファイラが動いている
+                pass
+        try:
+            yield self
+        finally:
+            if profiling:
+                self._profiler.disable()
+                self.profile_text = _format_profile(self._profiler)
+            if self.memory:
+                _stop_tracemalloc()
+            _current.reset(token)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        depth = len(self._stack)
+        tracing = self.memory and tracemalloc.is_tracing()
+        locked = tracing and not self._stack
+        if locked:
+            _memory_span_lock.acquire()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # 親区間のここまでのピークを退避してから計測し直す
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            self._stack.append([current, current])
+        else:
+            self._stack.append([0, 0])
+
+        index = len(self.spans)
+        self.spans.append(Span(name, 0.0, depth))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            base, peak = self._stack.pop()
+            peak_bytes = None
+            if tracing:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                peak_bytes = peak - base
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], peak)
+                tracemalloc.reset_peak()
+            if locked:
+                _memory_span_lock.release()
+            self.spans[index] = Span(name, seconds, depth, peak_bytes)
+            _log_span(self.spans[index])
+
+    def total_seconds(self) -> float:
+        """
+        Wall time of the top-level spans.
+        """
+        return sum(item.seconds for item in self.spans if item.depth == 0)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        One row per span in start order; nested spans are indented.
+        """
+        rows = [
+            {
+                "stage": "　" * item.depth + item.name,
+                "seconds": item.seconds,
+                "peak_mib": (
+                    None if item.peak_bytes is None else item.peak_bytes / 2**20
+                ),
+            }
+            for item in self.spans
+        ]
+        frame = pd.DataFrame(rows, columns=["stage", "seconds", "peak_mib"])
+        if not self.memory:
+            frame = frame.drop(columns="peak_mib")
+        return frame
+
+
+def current_recorder() -> Recorder | None:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Time the enclosed block as stage ``name``.
+
+    Recorded on the active ``Recorder`` if there is one; otherwise the
+    duration is only logged.
+    """
+    recorder = _current.get()
+    if recorder is not None:
+        with recorder.span(name):
+            yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _log_span(Span(name, time.perf_counter() - start))
+
+
+def instrumented(name: str | None = None) -> Callable[[Callable], Callable]:
+    """
+    Decorator form of ``span`` (the stage name defaults to the function name).
+    """
+
+    def decorate(func: Callable) -> Callable:
+        stage = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def _log_span(span_: Span) -> None:
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    message = "stage=%s seconds=%.4f"
+    args: tuple = (span_.name, span_.seconds)
+    if span_.peak_bytes is not None:
+        message += " peak_mib=%.1f"
+        args += (span_.peak_bytes / 2**20,)
+    logger.info(
+        message,
+        *args,
+        extra={
+            "stage": span_.name,
+            "seconds": span_.seconds,
+            "peak_bytes": span_.peak_bytes,
+        },
+    )
+
+
+def _start_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_owned = True
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        # 外部で開始された tracemalloc は止めない
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+
+def _format_profile(profiler: cProfile.Profile) -> str:
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    return out.getvalue()
@@ -0,0 +1,47 @@
+import streamlit as st
+
+from app.instrument import Recorder
+
+SPAN_COLUMN_LABELS = {
+    "stage": "処理",
+    "seconds": "時間 (秒)",
+    "peak_mib": "ピークメモリ (MiB)",
+}
+
+
+def instrumentation_options(key: str = "instrument") -> Recorder:
+    """
+    Sidebar switches for the optional (slower) measurements of this run.
+    """
+    with st.sidebar.expander("処理時間の計測"):
+        memory = st.checkbox(
+            "ピークメモリも計測する",
+            key=f"{key}_memory",
+            help=(
+                "tracemalloc を使うため、計測中は処理が遅くなります。"
+                "ピークはプロセス全体の値なので、他のセッションが同時に処理していると"
+                "その分も含まれます（計測するセッション同士は順番に実行します）。"
+            ),
+        )
+        profile = st.checkbox(
+            "cProfile を取得する",
+            key=f"{key}_profile",
+            help="関数ごとの累積時間（上位のみ）を表示します。",
+        )
+    return Recorder(memory=memory, profile=profile)
+
+
+def render_instrumentation(recorder: Recorder) -> None:
+    """
+    Collapsible panel with the spans (and profile) collected by ``recorder``.
+    """
+    if not recorder.spans:
+        return
+    with st.expander(f"処理時間の内訳（合計 {recorder.total_seconds():.2f} 秒）"):
+        st.dataframe(
+            recorder.to_frame().rename(columns=SPAN_COLUMN_LABELS),
+            hide_index=True,
+        )
+        if recorder.profile_text:
+            st.caption("cProfile（累積時間順）")
+            st.code(recorder.profile_text, language="text")
@@ -14,29 +14,39 @@ if ICON_PATH.exists():
 else:
     st.set_page_config(page_title="GreenNavi", page_icon=":seedling:", layout="wide")
 
-from app.battery_and_hydrogen import run_battery_and_hydrogen_simulation
-from app.battery_only import run_battery_only_simulation
+from app.cache import (
+    cached_run_battery_and_hydrogen_simulation,
+    cached_run_battery_only_simulation,
+    fingerprint_frame,
+    simulation_cache,
+)
 from app.graph.buy_electrivity import plot_buy_electricity
 from app.graph.h2_storage_kwh import plot_h2_storage_kwh
 from app.graph.repair_the_cottage import plot_repair_the_cottage
 from app.graph.sell_electricity import plot_sell_electricity
-from app.sidebar import render_sidebar
+from app.graph.timeseries import plot_timeseries
+from app.ingest import load_selected_data
+from app.instrument import configure_logging, span
+from app.instrument_panel import instrumentation_options, render_instrumentation
+from app.sidebar import NON_SIMULATION_SETTINGS, render_sidebar
+from app.stages import invalidated_stages, pipeline
+from app.summary import summarize
 
 st.header("GreenNavi", divider=True)
 
+configure_logging()
 settings = render_sidebar()
-uploaded_file = settings["uploaded_file"]
+recorder = instrumentation_options()
 run_simulation_clicked = settings["run_simulation_clicked"]
 compare_both = settings["compare_both"]
+renderer = settings["chart_renderer"]
 
-if uploaded_file is not None:
-    df = pd.read_csv(uploaded_file)
+# 同じ内容のファイルは再読み込み・再解析しない（再実行ごとに共有）
+with recorder.active(), span("load_data"):
+    df, data_name = load_selected_data(settings)
 
-    if "TIME" in df.columns:
-        df["TIME"] = pd.to_datetime(df["TIME"], errors="coerce")
-        df = df.dropna(subset=["TIME"]).reset_index(drop=True)
-
-    st.success("CSVファイルを読み込みました。ファイル名: {}".format(uploaded_file.name))
+if df is not None:
+    st.success("ファイルを読み込みました。ファイル名: {}".format(data_name))
 
     st.subheader("現在の設定値")
     st.table(
@@ -60,115 +70,140 @@ if uploaded_file is not None:
     )
 
     if run_simulation_clicked:
-        simulation_settings = {
-            key: value
-            for key, value in settings.items()
-            if key not in {"uploaded_file", "run_simulation_clicked"}
-        }
-
-        def summarize(
-            df_: pd.DataFrame, battery_only_simulation: float = None
-        ) -> pd.DataFrame:
-            household_consumption = sum(df_["pv_net_pos_kwh"]) - sum(
-                df_["sell_electricity"]
-            )
-            total_cost = df_["cost"].sum() * -1
-            total_buy_electricity = df_["buy_electricity"].sum()
-            total_sell_electricity = df_["sell_electricity"].sum()
-            carbon_dioxide_emissions = total_buy_electricity * 0.431  # kg-CO2/kWh
-            result = {
-                "総コスト (円)": [total_cost],
-                "総買電量 (kWh)": [total_buy_electricity],
-                "総売電量 (kWh)": [total_sell_electricity],
-                "自家消費率 (%)": [
-                    household_consumption / sum(df_["pv_net_pos_kwh"]) * 100
-                ],
-                "二酸化炭素排出量(kg-CO2)": [carbon_dioxide_emissions],  # kg-CO2
+        with recorder.active():
+            simulation_settings = {
+                key: value
+                for key, value in settings.items()
+                if key not in NON_SIMULATION_SETTINGS
             }
 
-            if battery_only_simulation is not None:
-                reduction_rate = (total_buy_electricity / battery_only_simulation) * 100
-                result["削減率 (%) (削減率=水素導入時の買電量/蓄電池単体の買電量)"] = [
-                    reduction_rate
-                ]
-            else:
-                result["削減率 (%) (削減率=水素導入時の買電量/蓄電池単体の買電量)"] = [
-                    "--"
-                ]
-
-            return pd.DataFrame.from_dict(
-                result,
-                orient="index",
-                columns=["値"],
-            )
-
-        try:
-            if compare_both:
-                col_l, col_r = st.columns(2)
-
-                with col_l:
-                    st.subheader("蓄電池", divider=True)
-                    with st.expander("蓄電池"):
-                        result_df_battery = run_battery_only_simulation(
-                            df, simulation_settings
-                        )
-                        st.dataframe(result_df_battery)
-                    battery_only_simulation = result_df_battery["buy_electricity"].sum()
-                    st.subheader("主要指標(蓄電池)", divider="green")
-                    st.table(summarize(result_df_battery))
-                    st.subheader("時系列グラフ", divider="rainbow")
-                    plot_sell_electricity(result_df_battery)
-                    plot_buy_electricity(result_df_battery)
-
-                with col_r:
-                    st.subheader("蓄電池 + 水素", divider=True)
-                    with st.expander("蓄電池 + 水素"):
-                        result_df_hydrogen = run_battery_and_hydrogen_simulation(
-                            df, simulation_settings
-                        )
-                        st.dataframe(result_df_hydrogen)
-                    st.subheader("主要指標(蓄電池 + 水素)", divider="green")
-                    st.table(summarize(result_df_hydrogen, battery_only_simulation))
-                    st.subheader("時系列グラフ", divider="rainbow")
-                    plot_sell_electricity(result_df_hydrogen)
-                    plot_buy_electricity(result_df_hydrogen)
-                    plot_h2_storage_kwh(result_df_hydrogen)
-                    plot_repair_the_cottage(result_df_hydrogen)
+            try:
+                if compare_both:
+                    col_l, col_r = st.columns(2)
+
+                    with col_l:
+                        st.subheader("蓄電池", divider=True)
+                        with st.expander("蓄電池"):
+                            with span("simulate_battery_only"):
+                                result_df_battery = cached_run_battery_only_simulation(
+                                    df, simulation_settings
+                                )
+                            with span("render_result_table"):
+                                st.dataframe(result_df_battery.to_frame())
+                            st.caption(
+                                f"実行バックエンド: {result_df_battery.attrs.get('backend')}"
+                            )
+                        battery_only_simulation = result_df_battery[
+                            "buy_electricity"
+                        ].sum()
+                        st.subheader("主要指標(蓄電池)", divider="green")
+                        st.table(summarize(result_df_battery))
+                        st.subheader("時系列グラフ", divider="rainbow")
+                        plot_sell_electricity(result_df_battery, renderer)
+                        plot_buy_electricity(result_df_battery, renderer)
+                        st.subheader("時間ごとの推移", divider="rainbow")
+                        plot_timeseries(result_df_battery, key="timeseries_battery")
+
+                    with col_r:
+                        st.subheader("蓄電池 + 水素", divider=True)
+                        with st.expander("蓄電池 + 水素"):
+                            with span("simulate_battery_and_hydrogen"):
+                                result_df_hydrogen = (
+                                    cached_run_battery_and_hydrogen_simulation(
+                                        df, simulation_settings
+                                    )
+                                )
+                            with span("render_result_table"):
+                                st.dataframe(result_df_hydrogen.to_frame())
+                            st.caption(
+                                f"実行バックエンド: {result_df_hydrogen.attrs.get('backend')}"
+                            )
+                        st.subheader("主要指標(蓄電池 + 水素)", divider="green")
+                        st.table(summarize(result_df_hydrogen, battery_only_simulation))
+                        st.subheader("時系列グラフ", divider="rainbow")
+                        plot_sell_electricity(result_df_hydrogen, renderer)
+                        plot_buy_electricity(result_df_hydrogen, renderer)
+                        plot_h2_storage_kwh(result_df_hydrogen, renderer)
+                        plot_repair_the_cottage(result_df_hydrogen, renderer)
+                        st.subheader("時間ごとの推移", divider="rainbow")
+                        plot_timeseries(result_df_hydrogen, key="timeseries_hydrogen")
+
+                    result_df = None
 
+                else:
+                    if settings["mode"] == "蓄電池":
+                        st.subheader("蓄電池", divider=True)
+                        with span("simulate_battery_only"):
+                            result_df = cached_run_battery_only_simulation(
+                                df, simulation_settings
+                            )
+                    else:
+                        st.subheader("蓄電池 + 水素", divider=True)
+                        with span("simulate_battery_and_hydrogen"):
+                            result_df = cached_run_battery_and_hydrogen_simulation(
+                                df, simulation_settings
+                            )
+
+            except KeyError as error:
+                st.error(f"CSV内に必要な列が見つかりません: {error}")
+                result_df = None
+            except Exception as error:  # noqa: BLE001
+                st.error(f"シミュレーションの実行中にエラーが発生しました: {error}")
                 result_df = None
 
-            else:
-                if settings["mode"] == "蓄電池":
-                    st.subheader("蓄電池", divider=True)
-                    result_df = run_battery_only_simulation(df, simulation_settings)
-                else:
-                    st.subheader("蓄電池 + 水素", divider=True)
-                    result_df = run_battery_and_hydrogen_simulation(
-                        df, simulation_settings
-                    )
-
-        except KeyError as error:
-            st.error(f"CSV内に必要な列が見つかりません: {error}")
-            result_df = None
-        except Exception as error:  # noqa: BLE001
-            st.error(f"シミュレーションの実行中にエラーが発生しました: {error}")
-            result_df = None
-
-        if result_df is not None:
-            st.subheader("シミュレーション結果")
-            st.dataframe(result_df)
-            st.subheader("主要指標")
-            st.table(summarize(result_df))
-            st.subheader("時系列グラフ", divider="rainbow")
-            plot_sell_electricity(result_df)
-            plot_buy_electricity(result_df)
-            plot_repair_the_cottage(result_df)
-            if settings["mode"] == "蓄電池 + 水素":
-                plot_h2_storage_kwh(result_df)
+            cache_stats = simulation_cache.stats()
+            st.sidebar.caption(
+                "結果キャッシュ: ヒット {hits} 回 / ミス {misses} 回"
+                "（{size}/{maxsize} 件保持）".format(**cache_stats)
+            )
+
+            # 前回の実行から変わった設定に依存する段だけが再計算される。
+            # データは名前ではなく内容のハッシュで比べ、シナリオごとに前回と比べる
+            fingerprint = fingerprint_frame(df)
+            modes = ["蓄電池", "蓄電池 + 水素"] if compare_both else [settings["mode"]]
+            last_simulation = st.session_state.setdefault("last_simulation", {})
+            stage_captions = []
+            for mode in modes:
+                hydrogen_pipeline = mode == "蓄電池 + 水素"
+                previous = last_simulation.get(mode)
+                stages = invalidated_stages(
+                    previous[1] if previous and previous[0] == fingerprint else None,
+                    simulation_settings,
+                    hydrogen_pipeline,
+                )
+                last_simulation[mode] = (fingerprint, simulation_settings)
+                labels = [pipeline(hydrogen_pipeline)[name].label for name in stages]
+                stage_caption = "・".join(labels) or "なし（前回の結果を再利用）"
+                stage_captions.append(
+                    f"{mode}: {stage_caption}" if compare_both else stage_caption
+                )
+            st.sidebar.caption(
+                "設定の変更で再計算が必要な段: {}".format(" ／ ".join(stage_captions))
+            )
+
+            if result_df is not None:
+                st.subheader("シミュレーション結果")
+                with span("render_result_table"):
+                    st.dataframe(result_df.to_frame())
+                st.caption(f"実行バックエンド: {result_df.attrs.get('backend')}")
+                st.subheader("主要指標")
+                st.table(summarize(result_df))
+                st.subheader("時系列グラフ", divider="rainbow")
+                plot_sell_electricity(result_df, renderer)
+                plot_buy_electricity(result_df, renderer)
+                plot_repair_the_cottage(result_df, renderer)
+                if settings["mode"] == "蓄電池 + 水素":
+                    plot_h2_storage_kwh(result_df, renderer)
+                st.subheader("時間ごとの推移", divider="rainbow")
+                plot_timeseries(result_df)
 
     else:
         st.info(
             "設定を確認したらサイドバーの「シミュレーションを実行」を押してください"
         )
 else:
-    st.info("分析を始めるにはサイドバーからCSVファイルを選択してください")
+    st.info(
+        "分析を始めるにはサイドバーからデータファイル（CSV / Parquet / Feather）または前処理済みデータを選択してください"
+    )
+
+render_instrumentation(recorder)
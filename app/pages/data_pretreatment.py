@@ -1,18 +1,35 @@
-import io
+import codecs
 import os
 import sys
 from pathlib import Path
 
-import pandas as pd
 import streamlit as st
 
 # プロジェクトルート（app ディレクトリ）を import パスに追加
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+# app パッケージ（計測ユーティリティ）用にリポジトリのルートも追加
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
 
 # 前処理ロジックの import
-from preprocess.data_process import merge_and_compress_hourly  # noqa: E402
+from preprocess.data_process import (  # noqa: E402
+    CSV_ENGINES,
+    DEFAULT_CHUNK_ROWS,
+    FILE_ERROR,
+    FILE_SKIPPED,
+    OUTPUT_FORMATS,
+    merge_and_compress_hourly,
+    pyramid_dir_for,
+)
+
+from app.instrument import configure_logging  # noqa: E402
+from app.instrument_panel import (  # noqa: E402
+    instrumentation_options,
+    render_instrumentation,
+)
 
 ICON_PATH = ROOT / "images" / "greennavi.png"
 if ICON_PATH.exists():
@@ -22,6 +39,20 @@ else:
 
 st.title("データ前処理")
 
+configure_logging()
+recorder = instrumentation_options()
+
+OUTPUT_FORMAT_LABELS = {
+    "csv": "CSV",
+    "parquet": "Parquet",
+    "feather": "Feather (Arrow IPC)",
+}
+DOWNLOAD_MIME_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "feather": "application/vnd.apache.arrow.file",
+}
+
 # --- 環境変数からディレクトリパスを取得 ---
 # 環境変数が設定されていなければ、デフォルト値 (/app/data, /app/output) を使用
 # これにより、従来の Docker での実行と、ホストでの直接実行の両方に対応
@@ -61,33 +92,122 @@ else:
     st.warning(f"`{DATA_ROOT}` 直下に CSV ファイルが見つかりません。")
     st.stop()
 
+# 出力形式（Parquet / Feather は型を保ったまま読み込めるため高速）
+output_format = st.radio(
+    "出力形式",
+    options=list(OUTPUT_FORMATS),
+    format_func=OUTPUT_FORMAT_LABELS.get,
+    horizontal=True,
+)
+
 # 出力ファイル名を入力
-output_filename = st.text_input("出力ファイル名", value="2025_merged_hour_all.csv")
+output_filename = st.text_input(
+    "出力ファイル名", value="2025_merged_hour_all" + OUTPUT_FORMATS[output_format]
+)
+
+# 並列処理のワーカー数（1 なら逐次処理）
+max_workers = st.number_input(
+    "並列ワーカー数",
+    min_value=1,
+    value=min(os.cpu_count() or 1, len(csv_files)),
+    step=1,
+)
+
+# 前回から追加・変更されたファイルだけを処理する
+use_incremental = st.checkbox(
+    "差分処理（処理済みファイルはキャッシュを再利用する）",
+    value=True,
+    help=f"処理済みファイルの記録とキャッシュは `{OUTPUT_ROOT}` に保存されます。",
+)
+
+# 1分 / 15分 / 1時間 / 1日の集計も同時に作る（メイン画面で解像度を選べる）
+use_pyramid = st.checkbox(
+    "多解像度データ（1分 / 15分 / 1時間 / 1日）も作成する",
+    value=False,
+    help="出力ファイルと同じ場所の `<出力名>_pyramid` フォルダに保存されます。",
+)
+
+# 必要な列だけを型指定で読み込む（読み込み時間・メモリを削減）
+use_selective = st.checkbox("必要な列だけを読み込む（高速）", value=True)
+csv_engine = st.radio(
+    "CSV パーサ",
+    options=list(CSV_ENGINES),
+    format_func={"c": "pandas (C)", "pyarrow": "pyarrow"}.get,
+    horizontal=True,
+    disabled=not use_selective,
+    help="pyarrow はストリーミング処理では使われません。",
+)
+
+# 大きなファイル向け: 分割して読み込み、メモリ使用量を抑える
+use_streaming = st.checkbox(
+    "ストリーミング処理（大きなファイルを分割して読み込む）", value=False
+)
+chunk_rows = st.number_input(
+    "1 回に読み込む行数",
+    min_value=1_000,
+    value=DEFAULT_CHUNK_ROWS,
+    step=10_000,
+    disabled=not use_streaming,
+)
 
 # 前処理ボタン
 if st.button("前処理を実行"):
+    progress_bar = st.progress(0.0, text="前処理を実行中です…")
+    problems: list[tuple[str, str]] = []
+
+    def on_progress(
+        done: int, total: int, file_name: str, status: str, message: str
+    ) -> None:
+        progress_bar.progress(
+            done / total, text=f"{done} / {total} 件完了: {file_name}"
+        )
+        if status in (FILE_SKIPPED, FILE_ERROR):
+            problems.append((status, message))
+
     with st.spinner("前処理を実行中です…（数分かかる場合があります）"):
         try:
             # ここで単体スクリプトと同じロジックを呼び出す
-            output_path = merge_and_compress_hourly(
-                input_dir=DATA_ROOT,
-                output_dir=OUTPUT_ROOT,
-                output_filename=output_filename,
-            )
+            with recorder.active():
+                output_path = merge_and_compress_hourly(
+                    input_dir=DATA_ROOT,
+                    output_dir=OUTPUT_ROOT,
+                    output_filename=output_filename,
+                    max_workers=int(max_workers),
+                    progress=on_progress,
+                    chunksize=int(chunk_rows) if use_streaming else None,
+                    incremental=use_incremental,
+                    output_format=output_format,
+                    selective_columns=use_selective,
+                    csv_engine=csv_engine,
+                    pyramid=use_pyramid,
+                )
         except Exception as e:  # noqa: BLE001
             st.error(f"前処理中にエラーが発生しました: {e}")
         else:
             st.success(f"前処理完了: {output_path}")
+            if use_pyramid:
+                st.info(f"多解像度データ: {pyramid_dir_for(output_path)}")
 
-            # ダウンロード用に読み込み
-            df = pd.read_csv(output_path)
-            csv_buffer = io.StringIO()
-            df.to_csv(csv_buffer, index=False)
-            csv_bytes = csv_buffer.getvalue().encode("utf-8-sig")
+            # 書き出したファイルをそのままダウンロードに使う
+            # （CSV は Excel で文字化けしないよう BOM を付ける）
+            file_bytes = output_path.read_bytes()
+            if output_format == "csv":
+                file_bytes = codecs.BOM_UTF8 + file_bytes
 
             st.download_button(
-                label="結合済み CSV をダウンロード",
-                data=csv_bytes,
-                file_name=output_filename,
-                mime="text/csv",
+                label="結合済みデータをダウンロード",
+                data=file_bytes,
+                file_name=output_path.name,
+                mime=DOWNLOAD_MIME_TYPES[output_format],
             )
+
+    # スキップ・エラーになったファイルを個別に表示
+    if problems:
+        with st.expander(f"スキップ / エラーになったファイル: {len(problems)} 件"):
+            for status, message in problems:
+                if status == FILE_ERROR:
+                    st.error(message)
+                else:
+                    st.warning(message)
+
+    render_instrumentation(recorder)
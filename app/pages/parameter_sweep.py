@@ -0,0 +1,174 @@
+import os
+import sys
+from pathlib import Path
+
+# プロジェクトルートを import パスに追加（app パッケージを読み込むため）
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import japanize_matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+ICON_PATH = ROOT / "images" / "greennavi.png"
+if ICON_PATH.exists():
+    st.set_page_config(page_title="GreenNavi", page_icon=str(ICON_PATH), layout="wide")
+else:
+    st.set_page_config(page_title="GreenNavi", page_icon=":seedling:", layout="wide")
+
+from app.cache import fingerprint_frame, normalize_settings
+from app.ingest import load_selected_data
+from app.sidebar import NON_SIMULATION_SETTINGS, render_sidebar
+from app.summary import METRIC_LABELS
+from app.sweep import (
+    HYDROGEN_ONLY_PARAMETERS,
+    SWEEPABLE_PARAMETERS,
+    parameter_grid,
+    run_parameter_sweep,
+)
+
+st.title("パラメータスイープ")
+
+settings = render_sidebar(show_run_button=False, show_chart_options=False)
+df, data_name = load_selected_data(settings)
+
+if df is None:
+    st.info(
+        "スイープを始めるにはサイドバーからデータファイル（CSV / Parquet / Feather）"
+        "または前処理済みデータを選択してください"
+    )
+    st.stop()
+
+st.caption(f"データ: {data_name}")
+
+hydrogen = settings["mode"] == "蓄電池 + 水素"
+base_settings = {
+    key: value for key, value in settings.items() if key not in NON_SIMULATION_SETTINGS
+}
+fingerprint = fingerprint_frame(df)
+
+
+def fixed_settings(axes: list[str]) -> str:
+    # スイープした軸の値は結果に影響しないので比較から外す
+    return normalize_settings(
+        {key: value for key, value in base_settings.items() if key not in axes}
+    )
+
+
+# --- スイープ範囲の設定 ---
+options = [
+    name
+    for name in SWEEPABLE_PARAMETERS
+    if hydrogen or name not in HYDROGEN_ONLY_PARAMETERS
+]
+selected = st.multiselect(
+    "スイープするパラメータ",
+    options=options,
+    default=options[:2],
+    format_func=SWEEPABLE_PARAMETERS.get,
+)
+
+ranges = {}
+for name in selected:
+    col_min, col_max, col_steps = st.columns(3)
+    label = SWEEPABLE_PARAMETERS[name]
+    start = col_min.number_input(
+        f"{label} 最小", value=float(settings[name]), key=f"{name}_min"
+    )
+    stop = col_max.number_input(
+        f"{label} 最大", value=float(settings[name]), key=f"{name}_max"
+    )
+    steps = col_steps.number_input(
+        f"{label} 分割数", min_value=1, value=5, step=1, key=f"{name}_steps"
+    )
+    ranges[name] = np.linspace(start, stop, int(steps)).round(6).tolist()
+
+max_workers = st.number_input(
+    "並列ワーカー数", min_value=1, value=os.cpu_count() or 1, step=1
+)
+st.caption(f"グリッド点数: {len(parameter_grid(ranges)) if ranges else 0} 点")
+
+if st.button("スイープを実行", type="primary", disabled=not ranges):
+    progress_bar = st.progress(0.0, text="スイープを実行中です…")
+    table = st.empty()
+
+    def on_progress(done: int, total: int, partial: pd.DataFrame) -> None:
+        progress_bar.progress(done / total, text=f"{done} / {total} 点完了")
+        table.dataframe(partial)
+
+    try:
+        result = run_parameter_sweep(
+            df,
+            base_settings,
+            ranges,
+            hydrogen=hydrogen,
+            max_workers=int(max_workers),
+            progress=on_progress,
+        )
+    except KeyError as error:
+        st.error(f"CSV内に必要な列が見つかりません: {error}")
+    except Exception as error:  # noqa: BLE001
+        st.error(f"スイープの実行中にエラーが発生しました: {error}")
+    else:
+        table.empty()
+        axes = list(ranges)
+        st.session_state["sweep_result"] = (
+            result,
+            axes,
+            fingerprint,
+            fixed_settings(axes),
+        )
+
+# 別のデータに切り替えたら前のスイープ結果は捨てる
+if (
+    "sweep_result" in st.session_state
+    and st.session_state["sweep_result"][2] != fingerprint
+):
+    del st.session_state["sweep_result"]
+
+# --- 結果の表示（ヒートマップの軸を変えても再計算しない）---
+if "sweep_result" in st.session_state:
+    result, axes, _, swept_settings = st.session_state["sweep_result"]
+
+    st.subheader("スイープ結果", divider=True)
+    if swept_settings != fixed_settings(axes):
+        st.warning(
+            "サイドバーの設定がスイープ実行時から変わっています。"
+            "現在の設定の結果を見るにはスイープを再実行してください"
+        )
+    st.dataframe(result.rename(columns={**SWEEPABLE_PARAMETERS, **METRIC_LABELS}))
+
+    metric = st.selectbox(
+        "ヒートマップの指標", options=list(METRIC_LABELS), format_func=METRIC_LABELS.get
+    )
+    x_axis = st.selectbox("横軸", options=axes, format_func=SWEEPABLE_PARAMETERS.get)
+    y_options = [name for name in axes if name != x_axis] or [x_axis]
+    y_axis = st.selectbox(
+        "縦軸", options=y_options, format_func=SWEEPABLE_PARAMETERS.get
+    )
+
+    # 3 次元以上のスイープでは残りの軸を平均する
+    if y_axis == x_axis:
+        heatmap = result.groupby(x_axis)[metric].mean().to_frame().T
+    else:
+        heatmap = result.pivot_table(
+            index=y_axis, columns=x_axis, values=metric, aggfunc="mean"
+        )
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    image = ax.imshow(heatmap.values, aspect="auto", origin="lower", cmap="viridis")
+    for (row, col), value in np.ndenumerate(heatmap.values):
+        ax.text(col, row, f"{value:.1f}", ha="center", va="center", color="white")
+    ax.set_xticks(range(len(heatmap.columns)), heatmap.columns)
+    ax.set_yticks(range(len(heatmap.index)), heatmap.index)
+    ax.set_xlabel(SWEEPABLE_PARAMETERS[x_axis])
+    if y_axis != x_axis:
+        ax.set_ylabel(SWEEPABLE_PARAMETERS[y_axis])
+    ax.set_title(METRIC_LABELS[metric])
+    fig.colorbar(image, ax=ax)
+    fig.tight_layout()
+    st.pyplot(fig)
+    plt.close(fig)
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app.engine import simulate_arrays
+
+# これより短い区間には分割しない（1 週間分の時間データ）
+MIN_SEGMENT_ROWS = 24 * 7
+SEGMENTS_PER_WORKER = 4
+# 再計算時に投機結果との一致を確認する最初の窓幅（以降倍々に広げる）
+COALESCE_WINDOW_ROWS = 24
+
+# ワーカープロセスごとに 1 回だけ受け取る入力配列とパラメータ
+_worker_inputs: dict[str, object] = {}
+
+
+def _init_worker(load, pv, month_code, params) -> None:
+    _worker_inputs["load"] = load
+    _worker_inputs["pv"] = pv
+    _worker_inputs["month_code"] = month_code
+    _worker_inputs["params"] = params
+
+
+def _simulate_rows(
+    start: int,
+    stop: int,
+    battery_capacity: float,
+    h2_storage_kwh: float,
+):
+    """
+    Simulate rows ``start`` .. ``stop - 1`` from the given start state.
+
+    Row ``start - 1`` is passed along as the engine's state row and dropped
+    from the output, so the first simulated step is ``start`` itself.
+    """
+    load = _worker_inputs["load"]
+    pv = _worker_inputs["pv"]
+    month_code = _worker_inputs["month_code"]
+    params = _worker_inputs["params"]
+
+    first = start - 1 if start > 0 else 0
+    results, backend_used = simulate_arrays(
+        load[first:stop],
+        pv[first:stop],
+        battery_capacity,
+        month_code=None if month_code is None else month_code[first:stop],
+        initial_h2_storage_kwh=h2_storage_kwh,
+        **params,
+    )
+    if start > 0:
+        results = {name: values[1:] for name, values in results.items()}
+    return results, backend_used
+
+
+def _run_segment(
+    start: int,
+    stop: int,
+    battery_capacity: float,
+    h2_storage_kwh: float,
+    previous: tuple[np.ndarray, np.ndarray] | None = None,
+):
+    """
+    Simulate one segment; returns the output arrays and the backend that ran.
+
+    ``previous`` holds the battery / H2 trajectory of an earlier, speculative
+    run of the same segment. The re-run then advances in growing windows and
+    stops as soon as its state equals that trajectory: from there on both
+    runs are identical, so only the differing prefix is returned.
+    """
+    if previous is None:
+        return _simulate_rows(start, stop, battery_capacity, h2_storage_kwh)
+
+    previous_battery, previous_h2 = previous
+    pieces = []
+    state = (battery_capacity, h2_storage_kwh)
+    position = start
+    window = COALESCE_WINDOW_ROWS
+    while position < stop:
+        end = min(position + window, stop)
+        results, backend_used = _simulate_rows(position, end, *state)
+        pieces.append(results)
+        state = _end_state(results)
+        offset = end - start - 1
+        if _same_state(state, (previous_battery[offset], previous_h2[offset])):
+            break
+        position = end
+        window *= 2
+
+    merged = {
+        name: np.concatenate([piece[name] for piece in pieces]) for name in pieces[0]
+    }
+    return merged, backend_used
+
+
+def _splice(
+    prefix: dict[str, np.ndarray], previous: dict[str, np.ndarray]
+) -> dict[str, np.ndarray]:
+    length = len(next(iter(prefix.values())))
+    return {
+        name: np.concatenate([prefix[name], previous[name][length:]]) for name in prefix
+    }
+
+
+def _trajectory(results: dict[str, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    battery = results["batt_soc_kwh"]
+    if "h2_storage_kwh" in results:
+        return battery, results["h2_storage_kwh"]
+    return battery, np.zeros_like(battery)
+
+
+def _end_state(results: dict[str, np.ndarray]) -> tuple[float, float]:
+    battery = float(results["batt_soc_kwh"][-1])
+    if "h2_storage_kwh" in results:
+        return battery, float(results["h2_storage_kwh"][-1])
+    return battery, 0.0
+
+
+def _same_state(a: tuple[float, float], b: tuple[float, float]) -> bool:
+    # NaN 同士も一致とみなす（NaN 初期値で永久に再計算しないように）
+    return all(x == y or (x != x and y != y) for x, y in zip(a, b))
+
+
+def segment_bounds(n: int, segments: int) -> list[tuple[int, int]]:
+    edges = np.linspace(0, n, segments + 1).round().astype(int)
+    return [(int(lo), int(hi)) for lo, hi in zip(edges[:-1], edges[1:]) if hi > lo]
+
+
+def simulate_arrays_parallel(
+    load: np.ndarray,
+    pv: np.ndarray,
+    initial_battery_capacity: float,
+    *,
+    workers: int | None = None,
+    segments: int | None = None,
+    month_code: np.ndarray | None = None,
+    initial_h2_storage_kwh: float = 0.0,
+    guess_battery_capacity: float = 0.0,
+    guess_h2_storage_kwh: float = 0.0,
+    **params,
+) -> tuple[dict[str, np.ndarray], str, dict[str, int]]:
+    """
+    Speculative chunk-parallel version of ``simulate_arrays``.
+
+    The series is cut into segments that all start from a guessed state
+    (empty battery / empty H2 store by default) and run on a process pool.
+    Once SOC hits 0 or full the trajectory forgets its start state, so most
+    guesses end up matching the previous segment's real end state. Segments
+    whose guess was wrong are re-run from the corrected state, round after
+    round, until every boundary matches; a re-run stops as soon as it merges
+    with its speculative trajectory. The result is identical to a serial
+    run. Extra keyword arguments are passed through to ``simulate_arrays``.
+
+    Returns the output arrays, the backend that ran and run statistics
+    (``segments``, ``rounds``, ``reruns``).
+    """
+    workers = workers or os.cpu_count() or 1
+    n = len(load)
+    if segments is None:
+        segments = workers * SEGMENTS_PER_WORKER
+    segments = max(1, min(segments, n // MIN_SEGMENT_ROWS))
+
+    bounds = segment_bounds(n, segments)
+    load = np.ascontiguousarray(load, dtype=np.float64)
+    pv = np.ascontiguousarray(pv, dtype=np.float64)
+    if month_code is not None:
+        month_code = np.ascontiguousarray(month_code, dtype=np.int8)
+
+    starts = [(float(initial_battery_capacity), float(initial_h2_storage_kwh))]
+    starts += [(guess_battery_capacity, guess_h2_storage_kwh)] * (len(bounds) - 1)
+    outputs: list[dict[str, np.ndarray]] = [{}] * len(bounds)
+    backend_used = ""
+    rounds = 0
+    reruns = 0
+
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(bounds)),
+        initializer=_init_worker,
+        initargs=(load, pv, month_code, params),
+    ) as pool:
+        pending = list(range(len(bounds)))
+        while pending:
+            futures = {
+                i: pool.submit(
+                    _run_segment,
+                    *bounds[i],
+                    *starts[i],
+                    _trajectory(outputs[i]) if rounds else None,
+                )
+                for i in pending
+            }
+            for i, future in futures.items():
+                results, backend_used = future.result()
+                outputs[i] = _splice(results, outputs[i]) if rounds else results
+            if rounds:
+                reruns += len(pending)
+            rounds += 1
+
+            # 直前区間の終状態と推測した初期状態が食い違う区間だけ再計算する
+            pending = []
+            for i in range(1, len(bounds)):
+                end_of_previous = _end_state(outputs[i - 1])
+                if not _same_state(starts[i], end_of_previous):
+                    starts[i] = end_of_previous
+                    pending.append(i)
+
+    results = {
+        name: np.concatenate([output[name] for output in outputs])
+        for name in outputs[0]
+    }
+    stats = {"segments": len(bounds), "rounds": rounds, "reruns": reruns}
+    return results, backend_used, stats
+
+
+def simulate(
+    load: np.ndarray,
+    pv: np.ndarray,
+    initial_battery_capacity: float,
+    *,
+    workers: int | None = None,
+    **kwargs,
+) -> tuple[dict[str, np.ndarray], str, dict[str, int] | None]:
+    """
+    Run ``simulate_arrays`` serially, or chunk-parallel when ``workers > 1``.
+    """
+    if workers is None or workers <= 1 or len(load) < 2 * MIN_SEGMENT_ROWS:
+        results, backend_used = simulate_arrays(
+            load, pv, initial_battery_capacity, **kwargs
+        )
+        return results, backend_used, None
+    return simulate_arrays_parallel(
+        load, pv, initial_battery_capacity, workers=workers, **kwargs
+    )
@@ -1,31 +1,729 @@
 from __future__ import annotations
 
 import glob
+import hashlib
+import json
+import logging
 import os
+import pickle
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 import pandas as pd
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pragma: no cover - pyarrow は任意
+    pa = None
+    pa_csv = None
+
+from app.instrument import LOGGER_NAME, instrumented, span
+
+logger = logging.getLogger(f"{LOGGER_NAME}.preprocess")
+
+# ファイルごとの処理結果
+FILE_OK = "ok"
+FILE_SKIPPED = "skipped"
+FILE_ERROR = "error"
+
+
+# 生データ CSV の読み込み設定と、読み込み後に捨てる列
+RAW_CSV_OPTIONS = {"encoding": "shift_jis", "skiprows": 2, "low_memory": False}
+RAW_DROP_COLUMNS = ["INDEX.1", "TIME.1"]
+RAW_TIME_FORMAT = "%Y/%m/%d %H:%M:%S"
+CSV_ENGINES = ("c", "pyarrow")
+
+# 元の列名のズレ（全角スペース付き）の補正
+RAW_COLUMN_RENAMES = {
+    "直流母線\u3000計測電圧（000.0V)": "直流母線計測電圧（000.0V)",
+}
+
+# シミュレーション用データの作成に必要な列
+DESIRED_COLUMNS = [
+    "TIME",
+    "太陽光EZAグリッド電力(W)",
+    "太陽光EZAバッテリ電力(W)",
+    "バッテリEZAグリッド側電力(W)",
+    "バッテリEZAバッテリ側電力(W)",
+    "パワコンCT電流（00.00A）",
+    "直流母線計測電圧（000.0V)",
+    "制御電源電流(0.00A)",
+    "バッテリSOC(%)",
+]
+
+# 差分処理用の manifest と、ファイルごとの 1時間平均キャッシュの置き場所
+MANIFEST_FILENAME = "hourly_manifest.json"
+HOURLY_CACHE_DIRNAME = "hourly_cache"
+MANIFEST_VERSION = 1
+
+# 出力形式と拡張子（parquet / feather は型と datetime の TIME 列を保持する）
+OUTPUT_FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+# 多解像度ピラミッドの解像度名と集約単位
+PYRAMID_LEVELS = {"1min": "min", "15min": "15min", "hour": "h", "day": "D"}
+PYRAMID_DIR_SUFFIX = "_pyramid"
+MINUTE_CACHE_DIRNAME = "minute_cache"
+MINUTE_MANIFEST_FILENAME = "minute_manifest.json"
+
+# ストリーミング処理で 1 回に読む行数（2秒データで約 2.3 日分）
+DEFAULT_CHUNK_ROWS = 100_000
+
+
+@dataclass(frozen=True)
+class RawReadOptions:
+    """
+    生データ CSV の読み込み方法。
+
+    selective=True のときは ``DESIRED_COLUMNS`` に対応する列だけを
+    float64 として読み込み、TIME を ``time_format`` で解析する。
+    engine="pyarrow" は selective かつ非ストリーミング時のみ有効。
+    pyramid=True のときは 1時間平均ではなく 1分集計を返す（``build_pyramid`` 用）。
+    """
+
+    chunksize: Optional[int] = None
+    selective: bool = False
+    engine: str = "c"
+    time_format: Optional[str] = RAW_TIME_FORMAT
+    pyramid: bool = False
+
+
+class _SkipFile(Exception):
+    """ファイルを結合対象から外す（警告として扱う）。"""
+
+
+def _selected_columns(file: str) -> list[str]:
+    """ヘッダだけを読み、パイプラインで使う列（TIME を含む）を返す。"""
+    header = pd.read_csv(file, nrows=0, **RAW_CSV_OPTIONS).columns
+    return [
+        c
+        for c in header
+        if c == "TIME" or RAW_COLUMN_RENAMES.get(c, c) in DESIRED_COLUMNS
+    ]
+
+
+def _read_selected(
+    file: str, columns: list[str], engine: str, chunksize: Optional[int] = None
+):
+    """必要な列だけを型指定で読み込む（chunksize 指定時はイテレータ）。"""
+    value_columns = [c for c in columns if c != "TIME"]
+    if engine == "pyarrow" and chunksize is None:
+        table = pa_csv.read_csv(
+            file,
+            read_options=pa_csv.ReadOptions(
+                skip_rows=RAW_CSV_OPTIONS["skiprows"],
+                encoding=RAW_CSV_OPTIONS["encoding"],
+            ),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=columns,
+                column_types={
+                    "TIME": pa.string(),
+                    **{c: pa.float64() for c in value_columns},
+                },
+            ),
+        )
+        return table.to_pandas()
+    return pd.read_csv(
+        file,
+        usecols=columns,
+        dtype={"TIME": str, **{c: "float64" for c in value_columns}},
+        chunksize=chunksize,
+        **RAW_CSV_OPTIONS,
+    )
+
+
+def _parse_time(values: pd.Series, time_format: Optional[str]) -> pd.Series:
+    """
+    TIME を datetime に変換する。``time_format`` に合わない値だけを
+    形式推定で再解析するので、結果は推定のみの場合と同じになる。
+    """
+    if time_format is None:
+        return pd.to_datetime(values, errors="coerce")
+    parsed = pd.to_datetime(values, format=time_format, errors="coerce")
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], format="mixed", errors="coerce")
+    return parsed
+
+
+def _read_raw_frame(file: str, file_name: str, options: RawReadOptions) -> pd.DataFrame:
+    """ファイル全体を読み込み、不要列・TIME が不正な行を除いた DataFrame を返す。"""
+    if options.selective:
+        columns = _selected_columns(file)
+        if "TIME" not in columns:
+            raise _SkipFile(f"警告: {file_name} に TIME 列が無いためスキップ")
+        df = _read_selected(file, columns, options.engine)
+    else:
+        df = pd.read_csv(file, **RAW_CSV_OPTIONS)
+
+    # 不要列削除（あれば）
+    drop_cols = [c for c in RAW_DROP_COLUMNS if c in df.columns]
+    if drop_cols:
+        df = df.drop(columns=drop_cols)
+
+    # 全 NaN 列を削除
+    df = df.dropna(axis=1, how="all")
+
+    if "TIME" not in df.columns:
+        raise _SkipFile(f"警告: {file_name} に TIME 列が無いためスキップ")
+
+    if options.selective:
+        df["TIME"] = _parse_time(df["TIME"], options.time_format)
+    else:
+        df["TIME"] = pd.to_datetime(df["TIME"], errors="coerce")
+    df = df.dropna(subset=["TIME"])
+
+    if df.empty:
+        raise _SkipFile(f"警告: TIME 変換後に空になったためスキップ: {file_name}")
+    return df
+
+
+def _resample_hourly(
+    file: str, file_name: str, options: RawReadOptions
+) -> pd.DataFrame:
+    """ファイル全体を読み込んで 1時間平均に圧縮する。"""
+    df = _read_raw_frame(file, file_name, options)
+
+    # 1時間ごとにリサンプリング（平均）
+    return df.set_index("TIME").resample("h").mean(numeric_only=True).reset_index()
+
+
+def _aggregate(values: pd.DataFrame, bucket: pd.Series, extremes: bool) -> pd.DataFrame:
+    """
+    ``bucket`` ごとの合計・件数（``extremes`` なら最小・最大も）を求める。
+    列は (統計量, 元の列名) の MultiIndex。
+    """
+    grouped = values.groupby(bucket.rename("TIME"))
+    stats = {"sum": grouped.sum(), "count": grouped.count()}
+    if extremes:
+        stats["min"] = grouped.min()
+        stats["max"] = grouped.max()
+    return pd.concat(stats, axis=1)
+
+
+def _combine_aggregates(frame: pd.DataFrame, by=None) -> pd.DataFrame:
+    """
+    ``_aggregate`` の結果を時刻（または ``by``）ごとにまとめ直す。
+    重複した時刻の統合や、細かい解像度から粗い解像度への集約に使う。
+    """
+    by = frame.index.rename("TIME") if by is None else by
+    stats = {
+        "sum": frame["sum"].groupby(by).sum(),
+        "count": frame["count"].groupby(by).sum(),
+    }
+    if "min" in frame.columns.get_level_values(0):
+        stats["min"] = frame["min"].groupby(by).min()
+        stats["max"] = frame["max"].groupby(by).max()
+    return pd.concat(stats, axis=1)
+
+
+def _aggregate_chunked(
+    file: str, file_name: str, options: RawReadOptions, freq: str, extremes: bool
+) -> pd.DataFrame:
+    """
+    ``options.chunksize`` 行ずつ読み込み、``freq`` ごとの合計・件数
+    （``extremes`` なら最小・最大も）を積み上げる。メモリ使用量は
+    ファイルサイズではなくチャンクの大きさと区間数で決まる。
+    """
+    if options.selective:
+        selected = _selected_columns(file)
+        if "TIME" not in selected:
+            raise _SkipFile(f"警告: {file_name} に TIME 列が無いためスキップ")
+        chunks = _read_selected(file, selected, "c", options.chunksize)
+        time_format = options.time_format
+    else:
+        chunks = pd.read_csv(file, chunksize=options.chunksize, **RAW_CSV_OPTIONS)
+        time_format = None
+
+    columns: Optional[list[str]] = None
+    non_numeric: set[str] = set()
+    has_value: Optional[pd.Series] = None
+    totals: Optional[pd.DataFrame] = None
+
+    for chunk in chunks:
+        if columns is None:
+            if "TIME" not in chunk.columns:
+                raise _SkipFile(f"警告: {file_name} に TIME 列が無いためスキップ")
+            columns = [
+                c for c in chunk.columns if c != "TIME" and c not in RAW_DROP_COLUMNS
+            ]
+
+        # 全体で全 NaN の列・数値でない列は最後にまとめて除外する
+        present = chunk[columns].notna().any()
+        has_value = present if has_value is None else has_value | present
+        non_numeric.update(
+            c for c in columns if not pd.api.types.is_numeric_dtype(chunk[c])
+        )
+
+        bucket = _parse_time(chunk["TIME"], time_format).dt.floor(freq)
+        valid = bucket.notna()
+        if not valid.any():
+            continue
+
+        numeric = [c for c in columns if c not in non_numeric]
+        part = _aggregate(chunk.loc[valid, numeric], bucket[valid], extremes)
+
+        # チャンク境界をまたぐ区間も合計・件数の加算で正しく集計される
+        if totals is None:
+            totals = part
+        else:
+            totals = _combine_aggregates(pd.concat([totals, part]))
+
+    if totals is None:
+        raise _SkipFile(f"警告: TIME 変換後に空になったためスキップ: {file_name}")
+
+    keep = [
+        c
+        for c in columns
+        if has_value[c] and c not in non_numeric and c in totals["sum"].columns
+    ]
+    return totals.loc[:, (slice(None), keep)]
+
+
+def _means(totals: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """合計・件数から平均を求め、データの無い区間も NaN 行として並べる。"""
+    counts = totals["count"]
+    means = totals["sum"] / counts.where(counts > 0)
+    return means.sort_index().asfreq(freq)
+
+
+def _resample_hourly_chunked(
+    file: str, file_name: str, options: RawReadOptions
+) -> pd.DataFrame:
+    """
+    ストリーミング処理で 1時間平均を求める。
+
+    結果は ``_resample_hourly`` と同じ（浮動小数点の丸め誤差を除く）。
+    """
+    totals = _aggregate_chunked(file, file_name, options, "h", extremes=False)
+    return _means(totals, "h").reset_index()
+
+
+def _aggregate_minutely(
+    file: str, file_name: str, options: RawReadOptions
+) -> pd.DataFrame:
+    """
+    ピラミッドの基になる 1分ごとの合計・件数・最小・最大を求める
+    （生データを読むのは 1 回だけ）。
+    """
+    if options.chunksize:
+        return _aggregate_chunked(file, file_name, options, "min", extremes=True)
+
+    df = _read_raw_frame(file, file_name, options)
+    numeric = [
+        c for c in df.columns if c != "TIME" and pd.api.types.is_numeric_dtype(df[c])
+    ]
+    return _aggregate(df[numeric], df["TIME"].dt.floor("min"), extremes=True)
+
+
+def build_pyramid(minute_totals: list[pd.DataFrame]) -> dict[str, pd.DataFrame]:
+    """
+    ファイルごとの 1分集計をまとめ、``PYRAMID_LEVELS`` の各解像度の
+    平均・合計・最小・最大を返す（列名は ``<元の列名>_<統計量>``）。
 
+    粗い解像度は 1分集計から求めるため、平均は生データの平均と一致する
+    （浮動小数点の丸め誤差を除く）。重なった時刻のデータは統合される。
+    """
+    minute = _combine_aggregates(pd.concat(minute_totals))
+
+    levels: dict[str, pd.DataFrame] = {}
+    for level, freq in PYRAMID_LEVELS.items():
+        if freq == "min":
+            totals = minute
+        else:
+            totals = _combine_aggregates(
+                minute, by=minute.index.floor(freq).rename("TIME")
+            )
+        stats = {
+            "mean": _means(totals, freq),
+            "sum": totals["sum"].sort_index().asfreq(freq),
+            "min": totals["min"].sort_index().asfreq(freq),
+            "max": totals["max"].sort_index().asfreq(freq),
+        }
+        frame = pd.concat(stats, axis=1)
+        frame.columns = [f"{column}_{stat}" for stat, column in frame.columns]
+        levels[level] = frame.reset_index()
+    return levels
+
+
+def pyramid_means(stats: pd.DataFrame) -> pd.DataFrame:
+    """``build_pyramid`` の 1 解像度分から平均列だけを元の列名で取り出す。"""
+    means = [c for c in stats.columns if c.endswith("_mean")]
+    frame = stats[["TIME", *means]]
+    return frame.rename(columns={c: c[: -len("_mean")] for c in means})
+
+
+def _compress_file(
+    file: str, options: Optional[RawReadOptions] = None
+) -> tuple[Optional[pd.DataFrame], str, str]:
+    """
+    2秒データの CSV を 1 ファイル読み込み、1時間平均に圧縮する。
+
+    ``options.chunksize`` を指定するとファイルを分割して読み込む
+    （ストリーミング処理）。ワーカープロセスからも呼ばれるため、例外は
+    外に出さず (DataFrame または None, 状態, メッセージ) を返す。
+    """
+    options = options or RawReadOptions()
+    file_name = os.path.basename(file)
+    try:
+        if options.pyramid:
+            df = _aggregate_minutely(file, file_name, options)
+        elif options.chunksize:
+            df = _resample_hourly_chunked(file, file_name, options)
+        else:
+            df = _resample_hourly(file, file_name, options)
+
+        if df.empty:
+            raise _SkipFile(f"警告: resample 後に空になったためスキップ: {file_name}")
+
+        return df, FILE_OK, f"処理完了: {file_name}"
+
+    except _SkipFile as e:
+        return None, FILE_SKIPPED, str(e)
+    except Exception as e:  # noqa: BLE001
+        return None, FILE_ERROR, f"エラー: {file_name} - {e}"
+
+
+def _compress_files(
+    all_files: list[str],
+    max_workers: int,
+    progress: Optional[Callable[[int, int, str, str, str], None]],
+    options: Optional[RawReadOptions] = None,
+) -> list[tuple[Optional[pd.DataFrame], str, str]]:
+    """
+    全ファイルを圧縮し、入力順に並べた ``_compress_file`` の結果を返す。
+
+    ``max_workers > 1`` のときはファイルごとに別プロセスで処理する。
+    """
+    total = len(all_files)
+    results: list[tuple[Optional[pd.DataFrame], str, str]] = [
+        (None, FILE_ERROR, "")
+    ] * total
+
+    def report(done: int, index: int, status: str, message: str) -> None:
+        _log_file_result(status, message)
+        if progress is not None:
+            progress(done, total, os.path.basename(all_files[index]), status, message)
+
+    if max_workers <= 1 or total <= 1:
+        for index, file in enumerate(all_files):
+            results[index] = _compress_file(file, options)
+            report(index + 1, index, *results[index][1:])
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(max_workers, total)) as pool:
+        futures = {
+            pool.submit(_compress_file, file, options): index
+            for index, file in enumerate(all_files)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:  # noqa: BLE001  ワーカー自体が落ちた場合
+                file_name = os.path.basename(all_files[index])
+                results[index] = (None, FILE_ERROR, f"エラー: {file_name} - {e}")
+            report(done, index, *results[index][1:])
+    return results
+
+
+def _log_file_result(status: str, message: str) -> None:
+    level = logging.INFO if status == FILE_OK else logging.WARNING
+    logger.log(level, message, extra={"file_status": status})
+
+
+def _file_digest(file: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_manifest(manifest_path: Path) -> dict[str, dict]:
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest.get("files", {})
+
+
+def _save_manifest(manifest_path: Path, files: dict[str, dict]) -> None:
+    # 途中で落ちても壊れた manifest が残らないよう、置き換えで書き込む
+    tmp_path = manifest_path.with_suffix(".tmp")
+    tmp_path.write_text(
+        json.dumps(
+            {"version": MANIFEST_VERSION, "files": files},
+            ensure_ascii=False,
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+    os.replace(tmp_path, manifest_path)
+
+
+def _compress_files_incremental(
+    all_files: list[str],
+    output_dir: Path,
+    max_workers: int,
+    progress: Optional[Callable[[int, int, str, str, str], None]],
+    options: Optional[RawReadOptions] = None,
+) -> list[tuple[Optional[pd.DataFrame], str, str]]:
+    """
+    manifest と突き合わせ、新規・変更ファイルだけを圧縮する。
+
+    変更判定はサイズと更新時刻で行い、どちらかが違う場合だけ内容ハッシュを
+    計算する（touch されただけのファイルは再処理しない）。新規・変更ファイルの
+    ハッシュは処理前に 1 回だけ計算し、manifest とキャッシュ名にそのまま使う
+    （処理中に書き換えられたファイルは次回の変更判定で再処理される）。
+    1時間平均の結果は ``output_dir / HOURLY_CACHE_DIRNAME`` にファイルごとに
+    保存する（ピラミッド作成時は 1分集計を ``MINUTE_CACHE_DIRNAME`` に保存する）。
+    エラーになったファイルは記録せず、次回も再処理する。
+    """
+    if options is not None and options.pyramid:
+        manifest_path = output_dir / MINUTE_MANIFEST_FILENAME
+        cache_dir = output_dir / MINUTE_CACHE_DIRNAME
+    else:
+        manifest_path = output_dir / MANIFEST_FILENAME
+        cache_dir = output_dir / HOURLY_CACHE_DIRNAME
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    previous = _load_manifest(manifest_path)
+    files: dict[str, dict] = {}
+    total = len(all_files)
+    results: list[tuple[Optional[pd.DataFrame], str, str]] = [
+        (None, FILE_ERROR, "")
+    ] * total
+    pending: list[int] = []
+    # 処理前に取ったサイズ・更新時刻・ハッシュ（処理中に変わっても次回検出できる）
+    snapshots: dict[int, tuple[os.stat_result, str]] = {}
+    done = 0
+
+    for index, file in enumerate(all_files):
+        key = str(Path(file).resolve())
+        stat = os.stat(file)
+        entry = previous.get(key)
+        if entry is None:
+            digest = _file_digest(file)
+        elif entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            digest = _file_digest(file)
+            entry = entry if entry["hash"] == digest else None
+        else:
+            digest = entry["hash"]
+
+        if entry is not None and entry["status"] == FILE_OK:
+            try:
+                df = pd.read_pickle(cache_dir / f"{digest}.pkl")
+            except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+                entry = None
+
+        if entry is None:
+            pending.append(index)
+            snapshots[index] = (stat, digest)
+            continue
+
+        if entry["status"] != FILE_OK:
+            df = None
+        files[key] = {**entry, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        file_name = os.path.basename(file)
+        message = entry["message"]
+        if entry["status"] == FILE_OK:
+            message = f"変更なし（キャッシュ利用）: {file_name}"
+        results[index] = (df, entry["status"], entry["message"])
+        done += 1
+        _log_file_result(entry["status"], message)
+        if progress is not None:
+            progress(done, total, file_name, entry["status"], message)
+
+    def offset_progress(
+        pending_done: int, _: int, file_name: str, status: str, message: str
+    ) -> None:
+        if progress is not None:
+            progress(done + pending_done, total, file_name, status, message)
+
+    pending_files = [all_files[index] for index in pending]
+    processed = _compress_files(pending_files, max_workers, offset_progress, options)
+
+    for index, file, result in zip(pending, pending_files, processed):
+        results[index] = result
+        df, status, message = result
+        if status == FILE_ERROR:
+            continue
+        stat, digest = snapshots[index]
+        if df is not None:
+            df.to_pickle(cache_dir / f"{digest}.pkl")
+        files[str(Path(file).resolve())] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": digest,
+            "status": status,
+            "message": message,
+        }
+
+    # 入力から消えたファイルのキャッシュを削除
+    live = {entry["hash"] for entry in files.values()}
+    for cache_path in cache_dir.glob("*.pkl"):
+        if cache_path.stem not in live:
+            cache_path.unlink(missing_ok=True)
+
+    _save_manifest(manifest_path, files)
+    return results
+
+
+def output_format_for(path: Path) -> str:
+    """拡張子から出力形式を判定する（不明な拡張子は csv）。"""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".arrow":
+        return "feather"
+    for fmt, fmt_suffix in OUTPUT_FORMATS.items():
+        if suffix == fmt_suffix:
+            return fmt
+    return "csv"
+
+
+def write_hourly_frame(df: pd.DataFrame, path: Path, output_format: str) -> None:
+    if output_format == "parquet":
+        df.to_parquet(path, index=False)
+    elif output_format == "feather":
+        df.reset_index(drop=True).to_feather(path)
+    elif output_format == "csv":
+        df.to_csv(path, index=False)
+    else:
+        raise ValueError(f"未対応の出力形式です: {output_format}")
+
+
+def read_hourly_frame(path: Path) -> pd.DataFrame:
+    """``write_hourly_frame`` で書いたファイルを拡張子に応じて読み込む。"""
+    output_format = output_format_for(path)
+    if output_format == "parquet":
+        return pd.read_parquet(path)
+    if output_format == "feather":
+        return pd.read_feather(path)
+    return pd.read_csv(path)
+
+
+def pyramid_dir_for(output_path: Path) -> Path:
+    """出力ファイルに対応するピラミッドの保存先フォルダ。"""
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.stem + PYRAMID_DIR_SUFFIX)
+
+
+def _step_hours(freq: str) -> float:
+    delta = pd.Timedelta(freq if freq[0].isdigit() else f"1{freq}")
+    return delta / pd.Timedelta(hours=1)
+
+
+def _write_pyramid(
+    levels: dict[str, pd.DataFrame],
+    pyramid_dir: Path,
+    output_format: str,
+    hourly: pd.DataFrame,
+) -> None:
+    """解像度ごとにシミュレーション用データと集計値を書き出す。"""
+    pyramid_dir.mkdir(parents=True, exist_ok=True)
+    suffix = OUTPUT_FORMATS[output_format]
+    for level, freq in PYRAMID_LEVELS.items():
+        stats = levels[level]
+        write_hourly_frame(stats, pyramid_dir / f"{level}_stats{suffix}", output_format)
+        if level == "hour":
+            simulation_df = hourly
+        else:
+            simulation_df = transform_to_simulation_df(
+                pyramid_means(stats),
+                max_battery_capacity_kwh=7.4,
+                step_hours=_step_hours(freq),
+            )
+        write_hourly_frame(
+            simulation_df, pyramid_dir / f"{level}{suffix}", output_format
+        )
+
+
+@instrumented()
 def merge_and_compress_hourly(
     input_dir: Path,
     output_dir: Path,
     output_filename: str = "2025_merged_hour_all.csv",
+    max_workers: Optional[int] = 1,
+    progress: Optional[Callable[[int, int, str, str, str], None]] = None,
+    chunksize: Optional[int] = None,
+    incremental: bool = False,
+    output_format: Optional[str] = None,
+    selective_columns: bool = False,
+    csv_engine: str = "c",
+    time_format: Optional[str] = RAW_TIME_FORMAT,
+    pyramid: bool = False,
 ) -> Path:
     """
     指定フォルダ内の CSV をすべて読み込み、
     2秒データ → 1時間平均に圧縮して結合した CSV を出力する。
 
+    Parameters
+    ----------
+    max_workers
+        並列に処理するワーカープロセス数。1 なら従来どおり逐次処理、
+        None なら CPU コア数。
+    progress
+        1 ファイル終わるごとに
+        ``progress(完了数, 総数, ファイル名, 状態, メッセージ)`` で呼ばれる。
+        状態は FILE_OK / FILE_SKIPPED / FILE_ERROR のいずれか。
+    chunksize
+        指定すると各ファイルをこの行数ずつ読み込み、時間ごとの合計・件数を
+        積み上げて平均を求める（大きなファイルでもメモリ使用量が一定）。
+    incremental
+        True なら処理済みファイルを ``output_dir`` の manifest
+        （パス・サイズ・更新時刻・内容ハッシュ）と 1時間平均のキャッシュで
+        管理し、新規・変更ファイルだけを処理して結合し直す。
+    output_format
+        "csv" / "parquet" / "feather"。None なら ``output_filename`` の
+        拡張子から判定する。指定した場合は拡張子をその形式に合わせる。
+    selective_columns
+        True なら生データのうち ``transform_to_simulation_df`` で使う列だけを
+        float64 として読み込む（読み込み時間・メモリを大幅に削減）。
+    csv_engine
+        selective_columns 時の CSV パーサ。"c" または "pyarrow"
+        （pyarrow はストリーミング処理では使われない）。
+    time_format
+        selective_columns 時の TIME の書式。合わない値だけ形式推定で解析する。
+    pyramid
+        True なら生データを 1 回読むだけで 1分 / 15分 / 1時間 / 1日の
+        平均・合計・最小・最大を作り、出力ファイルと同じ場所の
+        ``<出力名>_pyramid`` フォルダに解像度ごとに保存する
+        （``<解像度>.<拡張子>`` がシミュレーション用、
+        ``<解像度>_stats.<拡張子>`` が集計値）。
+
     Returns
     -------
     Path
-        出力された CSV ファイルのパス
+        出力されたファイルのパス
     """
     input_dir = Path(input_dir)
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
 
+    if output_format is not None and output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"未対応の出力形式です: {output_format}")
+    if csv_engine not in CSV_ENGINES:
+        raise ValueError(f"未対応の CSV エンジンです: {csv_engine}")
+    if csv_engine == "pyarrow" and pa_csv is None:
+        warnings.warn(
+            "pyarrow が見つからないため CSV エンジンを c に切り替えます。",
+            RuntimeWarning,
+            stacklevel=2,
+        )
+        csv_engine = "c"
+    options = RawReadOptions(
+        chunksize=chunksize,
+        selective=selective_columns,
+        engine=csv_engine,
+        time_format=time_format,
+        pyramid=pyramid,
+    )
+
     # *.csv / *.CSV を両方対象にする
     all_files = sorted(
         glob.glob(str(input_dir / "*.csv")) + glob.glob(str(input_dir / "*.CSV"))
@@ -34,68 +732,56 @@ def merge_and_compress_hourly(
     if not all_files:
         raise FileNotFoundError(f"{input_dir} 内に CSV ファイルが見つかりません。")
 
-    compressed_df_list: list[pd.DataFrame] = []
-
-    for file in all_files:
-        file_name = os.path.basename(file)
-        try:
-            df = pd.read_csv(file, encoding="shift_jis", skiprows=2, low_memory=False)
-
-            # 不要列削除（あれば）
-            drop_cols = [c for c in ["INDEX.1", "TIME.1"] if c in df.columns]
-            if drop_cols:
-                df = df.drop(columns=drop_cols)
-
-            # 全 NaN 列を削除
-            df = df.dropna(axis=1, how="all")
-
-            if "TIME" not in df.columns:
-                print(f"警告: {file_name} に TIME 列が無いためスキップ")
-                continue
-
-            df["TIME"] = pd.to_datetime(df["TIME"], errors="coerce")
-            df = df.dropna(subset=["TIME"])
-
-            if df.empty:
-                print(f"警告: TIME 変換後に空になったためスキップ: {file_name}")
-                continue
-
-            # 1時間ごとにリサンプリング（平均）
-            df = (
-                df.set_index("TIME").resample("h").mean(numeric_only=True).reset_index()
+    workers = max_workers or os.cpu_count() or 1
+    with span("compress_files"):
+        if incremental:
+            results = _compress_files_incremental(
+                all_files, output_dir, workers, progress, options
             )
-
-            if df.empty:
-                print(f"警告: resample 後に空になったためスキップ: {file_name}")
-                continue
-
-            compressed_df_list.append(df)
-            print(f"処理完了: {file_name}")
-
-        except Exception as e:  # noqa: BLE001
-            print(f"エラー: {file_name} - {e}")
+        else:
+            results = _compress_files(all_files, workers, progress, options)
+    compressed_df_list = [df for df, _, _ in results if df is not None]
 
     if not compressed_df_list:
         raise RuntimeError("有効なデータが 1 つも生成されませんでした。")
 
-    merged_df = pd.concat(compressed_df_list, ignore_index=True)
-    merged_df = merged_df.sort_values("TIME").reset_index(drop=True)
+    with span("merge"):
+        if pyramid:
+            levels = build_pyramid(compressed_df_list)
+            merged_df = pyramid_means(levels["hour"])
+        else:
+            # ファイル名順に結合済みなので、通常は並べ替え不要
+            merged_df = pd.concat(compressed_df_list, ignore_index=True)
+            if not merged_df["TIME"].is_monotonic_increasing:
+                merged_df = merged_df.sort_values("TIME").reset_index(drop=True)
 
-    # --- 変更点: デバッグログとエラーハンドリングを追加 ---
-    print("transform_to_simulation_df を呼び出します...")
     try:
-        merged_df = transform_to_simulation_df(merged_df, max_battery_capacity_kwh=7.4)
-        print("transform_to_simulation_df の処理が完了しました。")
-    except Exception as e:
-        print(f"transform_to_simulation_df でエラーが発生しました: {e}")
+        with span("transform_to_simulation_df"):
+            merged_df = transform_to_simulation_df(
+                merged_df, max_battery_capacity_kwh=7.4
+            )
+    except Exception:
         # エラー発生時に現在のカラム構成を確認できるようにする
-        print(f"現在のカラム一覧: {merged_df.columns.tolist()}")
-        raise e
-    # ---------------------------------------------------
+        logger.exception(
+            "transform_to_simulation_df でエラーが発生しました（カラム一覧: %s）",
+            merged_df.columns.tolist(),
+        )
+        raise
 
     output_path = output_dir / output_filename
-    merged_df.to_csv(output_path, index=False)
-    print(f"全ファイル結合: {output_path} に保存しました。👍")
+    if output_format is None:
+        output_format = output_format_for(output_path)
+    elif output_format_for(output_path) != output_format:
+        output_path = output_path.with_suffix(OUTPUT_FORMATS[output_format])
+    with span("write_output"):
+        write_hourly_frame(merged_df, output_path, output_format)
+    logger.info("全ファイル結合: %s に保存しました。", output_path)
+
+    if pyramid:
+        pyramid_dir = pyramid_dir_for(output_path)
+        with span("write_pyramid"):
+            _write_pyramid(levels, pyramid_dir, output_format, hourly=merged_df)
+        logger.info("多解像度データ: %s に保存しました。", pyramid_dir)
 
     return output_path
 
@@ -104,6 +790,7 @@ def merge_and_compress_hourly(
 def transform_to_simulation_df(
     df: pd.DataFrame,
     max_battery_capacity_kwh: float = 7.4,
+    step_hours: float = 1.0,
 ) -> pd.DataFrame:
     """
     1時間平均済みデータに対して、
@@ -112,27 +799,16 @@ def transform_to_simulation_df(
     ・名前変更
     ・スケーリング
     を行い、シミュレーション用の形に整える。
+
+    1時間以外の平均を渡す場合は ``step_hours`` に 1 行あたりの時間
+    （15分なら 0.25）を指定すると、電力量が 1 行あたりの kWh になる。
     """
 
     # 元の列名のズレ（全角スペース付き）を補正
-    df = df.rename(
-        columns={
-            "直流母線\u3000計測電圧（000.0V)": "直流母線計測電圧（000.0V)",
-        }
-    )
+    df = df.rename(columns=RAW_COLUMN_RENAMES)
 
     # 必要なカラム
-    desired_columns = [
-        "TIME",
-        "太陽光EZAグリッド電力(W)",
-        "太陽光EZAバッテリ電力(W)",
-        "バッテリEZAグリッド側電力(W)",
-        "バッテリEZAバッテリ側電力(W)",
-        "パワコンCT電流（00.00A）",
-        "直流母線計測電圧（000.0V)",
-        "制御電源電流(0.00A)",
-        "バッテリSOC(%)",
-    ]
+    desired_columns = DESIRED_COLUMNS
 
     missing = [c for c in desired_columns if c not in df.columns]
     if missing:
@@ -197,10 +873,14 @@ def transform_to_simulation_df(
 
     df = change_name(df)
 
-    # W → kW へのスケーリング
+    # W → kW へのスケーリング（1 行あたりの電力量 kWh に換算）
     df["cottage_consumption"] = df["cottage_consumption"] / 1000.0
     df["pv_power_generation"] = df["pv_power_generation"] / 1000.0
     df["surplus_electricity"] = df["surplus_electricity"] / 1000.0
+    if step_hours != 1.0:
+        df["cottage_consumption"] *= step_hours
+        df["pv_power_generation"] *= step_hours
+        df["surplus_electricity"] *= step_hours
 
     # % → kWh（バッテリ容量 7.4kWh 前提）
     df["battery_capacity"] = max_battery_capacity_kwh * (df["battery_capacity"] / 100.0)
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import os
+from typing import Mapping
+
+import numpy as np
+import pandas as pd
+
+# 結果列の型（引数で未指定なら環境変数 GREENNAVI_RESULT_DTYPE を参照）
+RESULT_DTYPE_ENV_VAR = "GREENNAVI_RESULT_DTYPE"
+RESULT_DTYPES = ("float64", "float32")
+
+
+def resolve_result_dtype(dtype: str | np.dtype | None = None) -> np.dtype:
+    """
+    dtype of the result columns: ``dtype``, else ``GREENNAVI_RESULT_DTYPE``,
+    else float64.
+    """
+    requested = dtype or os.getenv(RESULT_DTYPE_ENV_VAR) or "float64"
+    resolved = np.dtype(requested)
+    if resolved.name not in RESULT_DTYPES:
+        raise ValueError(
+            f"unknown result dtype {requested!r}; "
+            f"expected one of {', '.join(RESULT_DTYPES)}"
+        )
+    return resolved
+
+
+def copy_on_write_enabled() -> bool:
+    """
+    Whether pandas copies a shared column before writing to it: always on
+    pandas 3, opt-in through the ``mode.copy_on_write`` option on pandas 2.
+    """
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True
+    return pd.get_option("mode.copy_on_write") is True
+
+
+class SimulationResult:
+    """
+    Per-row result of one simulation run, kept as arrays.
+
+    ``inputs`` is the prepared input frame, shared with the caller and
+    never copied; ``results`` holds one contiguous array per
+    result column (float32 with ``dtype="float32"``). With float64 the
+    arrays are the stage outputs themselves, so a cached result costs no
+    more than its stages.
+
+    Columns are read with ``result[name]`` like a DataFrame, which is all
+    the summary and the charts need; ``to_frame`` builds a DataFrame over
+    the same memory when one is really needed, e.g. for the result table.
+
+    ``owned=True`` states that no one else holds the result arrays, which
+    then stay writable; the ``run_*`` functions use it for the frame they
+    hand out, as pandas writes into an array in place once no other frame
+    refers to it.
+    """
+
+    def __init__(
+        self,
+        inputs: pd.DataFrame,
+        results: Mapping[str, np.ndarray],
+        attrs: Mapping[str, object] | None = None,
+        dtype: str | np.dtype | None = None,
+        owned: bool = False,
+    ):
+        dtype = resolve_result_dtype(dtype)
+        self.inputs = inputs
+        self.results: dict[str, np.ndarray] = {}
+        for name, values in results.items():
+            array = np.ascontiguousarray(values, dtype=dtype)
+            if not owned:
+                # float64 ならコピーせずビューを読み取り専用にする（元の配列は変えない）
+                array = array.view()
+                array.flags.writeable = False
+            self.results[name] = array
+        self.attrs: dict[str, object] = dict(attrs or {})
+        self.dtype = dtype
+        self._frame: pd.DataFrame | None = None
+
+    def __len__(self) -> int:
+        return len(self.inputs)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.results or name in self.inputs.columns
+
+    def __getitem__(self, name: str) -> pd.Series:
+        if name in self.results:
+            return pd.Series(
+                self.results[name], index=self.inputs.index, name=name, copy=False
+            )
+        return self.inputs[name]
+
+    @property
+    def columns(self) -> pd.Index:
+        extra = [name for name in self.results if name not in self.inputs.columns]
+        return self.inputs.columns.append(pd.Index(extra))
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes held by the result columns (the input columns are shared).
+        """
+        return sum(values.nbytes for values in self.results.values())
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        The result as a DataFrame: input columns followed by the result
+        columns, as the simulation functions return it.
+
+        With copy-on-write (see ``copy_on_write_enabled``) no column is
+        copied: every call returns a shallow copy of one frame over the
+        arrays of this result and the shared input, and writing to it copies
+        just the written column. Without it the frame is a deep copy, so
+        in-place writes can never reach the caller's input or a cached result.
+        """
+        if self._frame is None:
+            columns: dict[str, object] = {
+                name: self.inputs[name] for name in self.inputs.columns
+            }
+            columns.update(self.results)
+            self._frame = pd.DataFrame(columns, index=self.inputs.index, copy=False)
+        frame = self._frame.copy(deep=not copy_on_write_enabled())
+        frame.attrs = dict(self.attrs)
+        return frame
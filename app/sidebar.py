@@ -1,12 +1,49 @@
+import os
+from pathlib import Path
+
 import streamlit as st
 
+from app.graph.common import CHART_RENDERERS, DEFAULT_CHART_RENDERER
+from app.ingest import PYRAMID_LEVEL_LABELS, find_pyramids, pyramid_levels
+
+# サイドバーの戻り値のうちシミュレーションに渡さない項目
+NON_SIMULATION_SETTINGS = {
+    "uploaded_file",
+    "pyramid_file",
+    "run_simulation_clicked",
+    "chart_renderer",
+}
 
-def render_sidebar():
+
+def render_sidebar(show_run_button: bool = True, show_chart_options: bool = True):
     st.sidebar.header("1. データをアップロード")
     uploaded_file = st.sidebar.file_uploader(
-        "CSVファイルを選択してください", type="csv"
+        "CSV / Parquet / Feather ファイルを選択してください",
+        type=["csv", "parquet", "feather", "arrow"],
     )
 
+    # 前処理済みの多解像度データ（出力ディレクトリにある場合のみ表示）
+    pyramid_file = None
+    pyramids = find_pyramids(Path(os.getenv("OUTPUT_DIR", "/app/output")))
+    if pyramids:
+        pyramid_dir = st.sidebar.selectbox(
+            "前処理済みデータ（多解像度）",
+            options=[None, *pyramids],
+            format_func=lambda path: "使わない" if path is None else path.name,
+            help="ファイルをアップロードした場合はそちらが優先されます。",
+        )
+        if pyramid_dir is not None:
+            levels = pyramid_levels(pyramid_dir)
+            if levels:
+                level = st.sidebar.radio(
+                    "時間解像度",
+                    options=list(levels),
+                    index=list(levels).index("hour") if "hour" in levels else 0,
+                    format_func=PYRAMID_LEVEL_LABELS.get,
+                    horizontal=True,
+                )
+                pyramid_file = levels[level]
+
     st.sidebar.header("2. シミュレーション設定")
 
     mode = st.sidebar.segmented_control(
@@ -82,12 +119,23 @@ def render_sidebar():
         help="蓄電池 + 水素モード時のみ有効です",
     )
 
-    run_simulation_clicked = st.sidebar.button(
+    chart_renderer = DEFAULT_CHART_RENDERER
+    if show_chart_options:
+        chart_renderer = st.sidebar.radio(
+            "グラフの描画方法",
+            options=list(CHART_RENDERERS),
+            index=list(CHART_RENDERERS).index(DEFAULT_CHART_RENDERER),
+            format_func=CHART_RENDERERS.get,
+            help="matplotlib は画像として保存したい場合に使ってください。",
+        )
+
+    run_simulation_clicked = show_run_button and st.sidebar.button(
         "シミュレーションを実行", type="primary", width="stretch"
     )
 
     return {
         "uploaded_file": uploaded_file,
+        "pyramid_file": pyramid_file,
         "mode": mode,
         # 共通項目
         "max_battery_capacity": max_battery_capacity,
@@ -105,4 +153,6 @@ def render_sidebar():
         "run_simulation_clicked": run_simulation_clicked,
         # 同時比較
         "compare_both": compare_both,
+        # 表示設定
+        "chart_renderer": chart_renderer,
     }
@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Mapping
+
+import numpy as np
+import pandas as pd
+
+from app.engine import (
+    apply_costing,
+    apply_hydrogen,
+    as_datetime,
+    infer_step_hours,
+    initial_battery_capacity,
+    month_code_table,
+    month_codes,
+    resolve_backend,
+    simulate_arrays,
+)
+from app.instrument import instrumented
+from app.parallel import simulate
+from app.result import SimulationResult
+from app.summary import (
+    MONTHLY_SUM_COLUMNS,
+    SimulationSummary,
+    monthly_frame,
+    monthly_sums,
+)
+
+# 各段が使う設定項目
+DISPATCH_PARAMETERS = ("max_battery_capacity", "battery_rated_power_kwh")
+HYDROGEN_LAYER_PARAMETERS = (
+    "el_rated_power_kwh",
+    "el_efficiency",
+    "h2_storage_capacity_kwh",
+    "fc_rated_power_kwh",
+    "fc_efficiency",
+    "production_month",
+    "consumption_month",
+)
+COSTING_PARAMETERS = ("buy_price", "sell_price")
+
+# 集計のみモードで一度に計算する行数（メモリはこの行数 × 列数で頭打ちになる）
+SUMMARY_BLOCK_ROWS = 1 << 16
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One node of the recomputation graph: the settings it reads itself and
+    the stages whose output it consumes.
+    """
+
+    label: str
+    settings: tuple[str, ...] = ()
+    upstream: tuple[str, ...] = ()
+
+
+# 段の依存関係（上流から順に並べる）。グラフは料金を使わないので料金計算にはつながない
+BATTERY_PIPELINE = {
+    "dispatch": Stage("蓄電池の充放電", DISPATCH_PARAMETERS),
+    "costing": Stage("料金計算", COSTING_PARAMETERS, ("dispatch",)),
+    "summary": Stage("主要指標", (), ("costing",)),
+    "charts": Stage("グラフ", (), ("dispatch",)),
+}
+HYDROGEN_PIPELINE = {
+    "dispatch": Stage("蓄電池の充放電", DISPATCH_PARAMETERS),
+    "hydrogen": Stage("水素", HYDROGEN_LAYER_PARAMETERS, ("dispatch",)),
+    "costing": Stage("料金計算", COSTING_PARAMETERS, ("hydrogen",)),
+    "summary": Stage("主要指標", (), ("costing",)),
+    "charts": Stage("グラフ", (), ("hydrogen",)),
+}
+
+
+def pipeline(hydrogen: bool) -> dict[str, Stage]:
+    return HYDROGEN_PIPELINE if hydrogen else BATTERY_PIPELINE
+
+
+def stage_lineage(name: str, hydrogen: bool) -> tuple[str, ...]:
+    """
+    ``name`` and every stage upstream of it, in pipeline order.
+    """
+    stages = pipeline(hydrogen)
+    needed = {name}
+    for stage in reversed(list(stages)):
+        if stage in needed:
+            needed.update(stages[stage].upstream)
+    return tuple(stage for stage in stages if stage in needed)
+
+
+def stage_dependencies(name: str, hydrogen: bool) -> tuple[str, ...]:
+    """
+    Every setting the output of stage ``name`` depends on, directly or
+    through its upstream stages.
+    """
+    stages = pipeline(hydrogen)
+    return tuple(
+        key for stage in stage_lineage(name, hydrogen) for key in stages[stage].settings
+    )
+
+
+def _canonical(value: object) -> object:
+    # 月のリストは所属判定にしか使わないので順序を無視する
+    if isinstance(value, (list, tuple, set)):
+        return sorted(value)
+    return value
+
+
+def invalidated_stages(
+    previous: Mapping[str, object] | None,
+    current: Mapping[str, object],
+    hydrogen: bool,
+) -> list[str]:
+    """
+    Stages whose output changes between two settings, in pipeline order.
+
+    With no ``previous`` settings every stage has to run.
+    """
+    stages = pipeline(hydrogen)
+    if previous is None:
+        return list(stages)
+    changed = {
+        key
+        for key in set(previous) | set(current)
+        if _canonical(previous.get(key)) != _canonical(current.get(key))
+    }
+    return [
+        name
+        for name in stages
+        if changed.intersection(stage_dependencies(name, hydrogen))
+    ]
+
+
+@dataclass(frozen=True)
+class BatteryDispatch:
+    """
+    Output of the battery stage for one input and battery settings.
+
+    The battery never depends on the hydrogen layer or on prices, so one
+    dispatch can feed both scenarios and any number of hydrogen / tariff
+    variants. ``flows`` must not be modified.
+    """
+
+    flows: dict[str, np.ndarray]
+    backend: str
+    step_hours: float
+    parallel: dict[str, int] | None = None
+
+
+def prepare_input(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Shallow copy of ``df`` with ``TIME`` parsed; input columns are shared
+    and the stages only add result columns.
+    """
+    df_result = df.copy(deep=False)
+    df_result["TIME"] = as_datetime(df_result["TIME"])
+    return df_result
+
+
+@instrumented()
+def dispatch_battery_stage(
+    df: pd.DataFrame,
+    settings: Mapping[str, object],
+    *,
+    hydrogen: bool = False,
+    backend: str | None = None,
+    workers: int | None = None,
+    step_hours: float | None = None,
+) -> BatteryDispatch:
+    """
+    Battery stage: charge / discharge for every row of ``df``.
+
+    ``hydrogen`` selects the scenario the dispatch is meant for, which only
+    affects the backend (``"vectorized"`` is battery-only). ``workers > 1``
+    runs long inputs chunk-parallel (``app.parallel``).
+    """
+    if step_hours is None:
+        step_hours = infer_step_hours(df["TIME"])
+    max_battery_capacity = settings["max_battery_capacity"]
+    flows, backend_used, parallel_stats = simulate(
+        df["load_site_kwh"].to_numpy(dtype=float),
+        df["pv_net_pos_kwh"].to_numpy(dtype=float),
+        initial_battery_capacity(df, max_battery_capacity),
+        max_battery_capacity=max_battery_capacity,
+        battery_rated_power_kwh=settings["battery_rated_power_kwh"] * step_hours,
+        backend=resolve_backend(backend, hydrogen),
+        workers=workers,
+    )
+    return BatteryDispatch(flows, backend_used, step_hours, parallel_stats)
+
+
+@instrumented()
+def hydrogen_stage(
+    df: pd.DataFrame,
+    dispatch: BatteryDispatch,
+    settings: Mapping[str, object],
+    backend: str | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    Hydrogen layer on top of a battery dispatch of the same ``df``.
+    """
+    step_hours = dispatch.step_hours
+    flows, _ = apply_hydrogen(
+        dispatch.flows,
+        month_codes(
+            df["TIME"], settings["production_month"], settings["consumption_month"]
+        ),
+        el_rated_power_kwh=settings["el_rated_power_kwh"] * step_hours,
+        el_efficiency=settings["el_efficiency"],
+        h2_storage_capacity_kwh=settings["h2_storage_capacity_kwh"],
+        fc_rated_power_kwh=settings["fc_rated_power_kwh"] * step_hours,
+        fc_efficiency=settings["fc_efficiency"],
+        backend=backend,
+    )
+    return flows
+
+
+@instrumented()
+def costing_stage(
+    flows: Mapping[str, np.ndarray], settings: Mapping[str, object]
+) -> dict[str, np.ndarray]:
+    return apply_costing(flows, settings["buy_price"], settings["sell_price"])
+
+
+def build_result(
+    df: pd.DataFrame,
+    results: Mapping[str, np.ndarray],
+    dispatch: BatteryDispatch,
+    dtype: str | np.dtype | None = None,
+    owned: bool = False,
+) -> SimulationResult:
+    """
+    Wrap the stage outputs for the prepared input ``df`` without copying
+    either (see ``app.result.SimulationResult``).
+    """
+    attrs = {"backend": dispatch.backend, "step_hours": dispatch.step_hours}
+    if dispatch.parallel is not None:
+        attrs["parallel"] = dispatch.parallel
+    return SimulationResult(df, results, attrs, dtype, owned=owned)
+
+
+def detach_dispatch(
+    results: Mapping[str, np.ndarray], dispatch: BatteryDispatch
+) -> dict[str, np.ndarray]:
+    """
+    Copy the arrays of ``results`` that belong to ``dispatch``, for a
+    caller-owned result built on a dispatch shared with other runs.
+    """
+    shared = {id(values) for values in dispatch.flows.values()}
+    return {
+        name: values.copy() if id(values) in shared else values
+        for name, values in results.items()
+    }
+
+
+@instrumented()
+def run_summary_simulation(
+    df: pd.DataFrame,
+    settings: Mapping[str, object],
+    *,
+    hydrogen: bool = True,
+    backend: str | None = None,
+    step_hours: float | None = None,
+    block_rows: int = SUMMARY_BLOCK_ROWS,
+) -> SimulationSummary:
+    """
+    Summary-only run: the totals ``summarize`` needs and the monthly totals
+    of the charts, without building per-row result columns.
+
+    The stages run over blocks of ``block_rows`` rows, carrying the battery
+    and H2 state from block to block, and the totals are accumulated as
+    they go; working memory does not grow with the length of ``df`` and
+    the input is not copied. The cost total is taken from the energy
+    totals, so it matches the full run up to rounding.
+    """
+    time = as_datetime(df["TIME"])
+    if step_hours is None:
+        step_hours = infer_step_hours(time)
+    load = df["load_site_kwh"].to_numpy(dtype=np.float64)
+    pv = df["pv_net_pos_kwh"].to_numpy(dtype=np.float64)
+    month = time.dt.month.to_numpy(dtype=np.int8)
+    n = len(load)
+
+    params = {
+        "max_battery_capacity": settings["max_battery_capacity"],
+        "battery_rated_power_kwh": settings["battery_rated_power_kwh"] * step_hours,
+        "hydrogen": hydrogen,
+        "backend": resolve_backend(backend, hydrogen),
+    }
+    if hydrogen:
+        table = month_code_table(
+            settings["production_month"], settings["consumption_month"]
+        )
+        params.update(
+            el_rated_power_kwh=settings["el_rated_power_kwh"] * step_hours,
+            el_efficiency=settings["el_efficiency"],
+            h2_storage_capacity_kwh=settings["h2_storage_capacity_kwh"],
+            fc_rated_power_kwh=settings["fc_rated_power_kwh"] * step_hours,
+            fc_efficiency=settings["fc_efficiency"],
+        )
+
+    battery = float(settings["max_battery_capacity"])
+    if n:
+        battery = initial_battery_capacity(df, battery)
+    h2_storage = 0.0
+    total_buy = 0.0
+    total_sell = 0.0
+    sums: dict[str, np.ndarray] = {}
+    backend_used = params["backend"]
+
+    for start in range(0, n, block_rows):
+        # 2 ブロック目以降は直前の行を状態行として渡し、出力からは外す
+        first = start - 1 if start > 0 else 0
+        stop = min(start + block_rows, n)
+        flows, backend_used = simulate_arrays(
+            load[first:stop],
+            pv[first:stop],
+            battery,
+            month_code=table[month[first:stop]] if hydrogen else None,
+            initial_h2_storage_kwh=h2_storage,
+            **params,
+        )
+        if start > 0:
+            flows = {name: values[1:] for name, values in flows.items()}
+
+        battery = float(flows["batt_soc_kwh"][-1])
+        if hydrogen:
+            h2_storage = float(flows["h2_storage_kwh"][-1])
+        total_buy += float(np.nansum(flows["buy_electricity"]))
+        total_sell += float(np.nansum(flows["sell_electricity"]))
+        for column in MONTHLY_SUM_COLUMNS:
+            if column in flows:
+                block = monthly_sums(month[start:stop], flows[column])
+                sums[column] = sums[column] + block if column in sums else block
+
+    return SimulationSummary(
+        total_cost=total_buy * settings["buy_price"]
+        - total_sell * settings["sell_price"],
+        total_buy_electricity=total_buy,
+        total_sell_electricity=total_sell,
+        total_pv=float(np.sum(pv)),
+        monthly=monthly_frame(sums),
+        rows=n,
+        backend=backend_used,
+        step_hours=step_hours,
+    )
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Mapping
+
+import numpy as np
+import pandas as pd
+
+from app.instrument import instrumented
+
+CO2_KG_PER_KWH = 0.431  # kg-CO2/kWh
+
+# 年度順（4→12→1→3）
+FISCAL_MONTH_ORDER = [4, 5, 6, 7, 8, 9, 10, 11, 12, 1, 2, 3]
+
+# グラフで使う月別合計の列（結果に無い列は作らない）
+MONTHLY_SUM_COLUMNS = (
+    "sell_electricity",
+    "buy_electricity",
+    "h2_storage_kwh",
+    "discharge",
+    "fc_output_used_kwh",
+)
+
+# 指標キーと画面表示用ラベルの対応
+METRIC_LABELS = {
+    "total_cost": "総コスト (円)",
+    "total_buy_electricity": "総買電量 (kWh)",
+    "total_sell_electricity": "総売電量 (kWh)",
+    "self_consumption_rate": "自家消費率 (%)",
+    "co2_emissions": "二酸化炭素排出量(kg-CO2)",
+}
+REDUCTION_RATE_LABEL = "削減率 (%) (削減率=水素導入時の買電量/蓄電池単体の買電量)"
+
+
+def metrics_from_totals(
+    total_cost: float,
+    total_buy_electricity: float,
+    total_sell_electricity: float,
+    total_pv: float,
+) -> dict[str, float]:
+    """
+    Build the summary metrics from column totals (``total_cost`` is the raw
+    sum of the ``cost`` column, i.e. positive when money is spent).
+    """
+    household_consumption = total_pv - total_sell_electricity
+    return {
+        "total_cost": total_cost * -1,
+        "total_buy_electricity": total_buy_electricity,
+        "total_sell_electricity": total_sell_electricity,
+        "self_consumption_rate": household_consumption / total_pv * 100,
+        "co2_emissions": total_buy_electricity * CO2_KG_PER_KWH,
+    }
+
+
+def monthly_sums(month: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Sums of ``values`` per month number (index 0-12); NaN counts as 0.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return np.bincount(
+        month, weights=np.where(np.isnan(values), 0.0, values), minlength=13
+    )
+
+
+def monthly_frame(sums: Mapping[str, np.ndarray]) -> pd.DataFrame:
+    """
+    Turn ``monthly_sums`` arrays into one row per month in fiscal order.
+    """
+    return pd.DataFrame(
+        {column: values[FISCAL_MONTH_ORDER] for column, values in sums.items()},
+        index=pd.Index(FISCAL_MONTH_ORDER, name="month"),
+    )
+
+
+@dataclass
+class SimulationSummary:
+    """
+    Totals of one simulation run without the per-row result columns.
+
+    ``total_cost`` is the raw sum of the ``cost`` column (positive when
+    money is spent); ``monthly`` has the same layout as
+    ``app.graph.common.monthly_totals`` so the charts can use it directly.
+    """
+
+    total_cost: float
+    total_buy_electricity: float
+    total_sell_electricity: float
+    total_pv: float
+    monthly: pd.DataFrame
+    rows: int
+    backend: str
+    step_hours: float
+
+    def metrics(self) -> dict[str, float]:
+        return metrics_from_totals(
+            self.total_cost,
+            self.total_buy_electricity,
+            self.total_sell_electricity,
+            self.total_pv,
+        )
+
+
+def compute_metrics(df: pd.DataFrame | SimulationSummary) -> dict[str, float]:
+    if isinstance(df, SimulationSummary):
+        return df.metrics()
+    return metrics_from_totals(
+        df["cost"].sum(),
+        df["buy_electricity"].sum(),
+        df["sell_electricity"].sum(),
+        sum(df["pv_net_pos_kwh"]),
+    )
+
+
+@instrumented()
+def summarize(
+    df_: pd.DataFrame | SimulationSummary, battery_only_simulation: float = None
+) -> pd.DataFrame:
+    metrics = compute_metrics(df_)
+    result = {label: [metrics[key]] for key, label in METRIC_LABELS.items()}
+
+    if battery_only_simulation is not None:
+        reduction_rate = (
+            metrics["total_buy_electricity"] / battery_only_simulation
+        ) * 100
+        result[REDUCTION_RATE_LABEL] = [reduction_rate]
+    else:
+        result[REDUCTION_RATE_LABEL] = ["--"]
+
+    return pd.DataFrame.from_dict(
+        result,
+        orient="index",
+        columns=["値"],
+    )
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Iterator, Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+from app.engine import (
+    apply_costing,
+    apply_hydrogen,
+    as_datetime,
+    dispatch_battery,
+    infer_step_hours,
+    month_code_table,
+)
+from app.summary import metrics_from_totals
+
+# スイープ対象にできる数値パラメータ（SimulationParams の数値項目）
+SWEEPABLE_PARAMETERS = {
+    "max_battery_capacity": "蓄電池容量 (kWh)",
+    "battery_rated_power_kwh": "蓄電池 定格出力 (kW)",
+    "buy_price": "買電単価 (円/kWh)",
+    "sell_price": "売電単価 (円/kWh)",
+    "el_rated_power_kwh": "水電解装置 定格出力 (kW)",
+    "el_efficiency": "水電解装置 効率",
+    "h2_storage_capacity_kwh": "水素貯蔵容量 (kWh換算)",
+    "fc_rated_power_kwh": "燃料電池 定格出力 (kW)",
+    "fc_efficiency": "燃料電池 効率",
+}
+HYDROGEN_ONLY_PARAMETERS = {
+    "el_rated_power_kwh",
+    "el_efficiency",
+    "h2_storage_capacity_kwh",
+    "fc_rated_power_kwh",
+    "fc_efficiency",
+}
+DEFAULT_POINTS_PER_TASK = 8
+
+# ワーカープロセスごとに 1 回だけ受け取る入力配列
+_worker_inputs: dict[str, object] = {}
+
+
+def parameter_grid(ranges: Mapping[str, Sequence[float]]) -> list[dict[str, float]]:
+    """
+    Cartesian product of the given values, one dict per grid point.
+    """
+    for name in ranges:
+        if name not in SWEEPABLE_PARAMETERS:
+            raise KeyError(f"スイープできないパラメータです: {name}")
+    names = list(ranges)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*(ranges[name] for name in names))
+    ]
+
+
+def _init_worker(load, pv, month, initial_battery, hydrogen, step_hours) -> None:
+    _worker_inputs["load"] = load
+    _worker_inputs["pv"] = pv
+    _worker_inputs["month"] = month
+    _worker_inputs["initial_battery"] = initial_battery
+    _worker_inputs["hydrogen"] = hydrogen
+    _worker_inputs["step_hours"] = step_hours
+    _worker_inputs["total_pv"] = float(np.sum(pv))
+    _worker_inputs.pop("dispatch", None)
+
+
+def _battery_flows(settings: Mapping[str, object]) -> dict[str, np.ndarray]:
+    """
+    Battery stage for ``settings``, reused while the battery settings stay
+    the same (consecutive grid points differ in the last swept parameter).
+    """
+    initial_battery = _worker_inputs["initial_battery"]
+    if initial_battery is None:
+        initial_battery = settings["max_battery_capacity"]
+    key = (
+        settings["max_battery_capacity"],
+        settings["battery_rated_power_kwh"],
+        initial_battery,
+    )
+    cached = _worker_inputs.get("dispatch")
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    flows, _ = dispatch_battery(
+        _worker_inputs["load"],
+        _worker_inputs["pv"],
+        initial_battery,
+        max_battery_capacity=settings["max_battery_capacity"],
+        battery_rated_power_kwh=settings["battery_rated_power_kwh"]
+        * _worker_inputs["step_hours"],
+        hydrogen=_worker_inputs["hydrogen"],
+    )
+    _worker_inputs["dispatch"] = (key, flows)
+    return flows
+
+
+def _simulate_point(settings: Mapping[str, object]) -> dict[str, float]:
+    step_hours = _worker_inputs["step_hours"]
+
+    flows = _battery_flows(settings)
+    if _worker_inputs["hydrogen"]:
+        table = month_code_table(
+            settings["production_month"], settings["consumption_month"]
+        )
+        flows, _ = apply_hydrogen(
+            flows,
+            table[_worker_inputs["month"]],
+            el_rated_power_kwh=settings["el_rated_power_kwh"] * step_hours,
+            el_efficiency=settings["el_efficiency"],
+            h2_storage_capacity_kwh=settings["h2_storage_capacity_kwh"],
+            fc_rated_power_kwh=settings["fc_rated_power_kwh"] * step_hours,
+            fc_efficiency=settings["fc_efficiency"],
+        )
+
+    results = apply_costing(flows, settings["buy_price"], settings["sell_price"])
+    return metrics_from_totals(
+        np.nansum(results["cost"]),
+        np.nansum(results["buy_electricity"]),
+        np.nansum(results["sell_electricity"]),
+        _worker_inputs["total_pv"],
+    )
+
+
+def _simulate_points(
+    points: list[tuple[int, dict[str, float]]],
+    base_settings: Mapping[str, object],
+) -> list[tuple[int, dict[str, float]]]:
+    rows = []
+    for index, point in points:
+        try:
+            metrics = _simulate_point({**base_settings, **point})
+        except Exception as error:  # noqa: BLE001
+            metrics = {"error": str(error)}
+        rows.append((index, {**point, **metrics}))
+    return rows
+
+
+def iter_parameter_sweep(
+    df: pd.DataFrame,
+    base_settings: Mapping[str, object],
+    ranges: Mapping[str, Sequence[float]],
+    *,
+    hydrogen: bool = True,
+    max_workers: int | None = None,
+    points_per_task: int = DEFAULT_POINTS_PER_TASK,
+) -> Iterator[list[tuple[int, dict[str, float]]]]:
+    """
+    Run every grid point of ``ranges`` on a process pool and yield the
+    ``(grid_index, row)`` pairs of each task as it finishes.
+
+    The input arrays are sent to each worker once through the pool
+    initializer; tasks only carry their grid points.
+    """
+    grid = parameter_grid(ranges)
+    if not hydrogen:
+        unused = HYDROGEN_ONLY_PARAMETERS.intersection(ranges)
+        if unused:
+            raise ValueError(
+                f"蓄電池モードでは使わないパラメータです: {sorted(unused)}"
+            )
+
+    time = as_datetime(df["TIME"])
+    load = df["load_site_kwh"].to_numpy(dtype=np.float64)
+    pv = df["pv_net_pos_kwh"].to_numpy(dtype=np.float64)
+    month = time.dt.month.to_numpy(dtype=np.int8)
+    initial_battery = (
+        float(df["batt_soc_kwh"].iat[0]) if "batt_soc_kwh" in df.columns else None
+    )
+
+    indexed = list(enumerate(grid))
+    tasks = [
+        indexed[start : start + points_per_task]
+        for start in range(0, len(indexed), points_per_task)
+    ]
+    workers = max_workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(
+        max_workers=max(1, min(workers, len(tasks))),
+        initializer=_init_worker,
+        initargs=(load, pv, month, initial_battery, hydrogen, infer_step_hours(time)),
+    ) as pool:
+        futures = [
+            pool.submit(_simulate_points, task, dict(base_settings)) for task in tasks
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def run_parameter_sweep(
+    df: pd.DataFrame,
+    base_settings: Mapping[str, object],
+    ranges: Mapping[str, Sequence[float]],
+    *,
+    hydrogen: bool = True,
+    max_workers: int | None = None,
+    points_per_task: int = DEFAULT_POINTS_PER_TASK,
+    progress: Callable[[int, int, pd.DataFrame], None] | None = None,
+) -> pd.DataFrame:
+    """
+    Run a parameter sweep and return one row per grid point (in grid order).
+
+    ``progress(done, total, partial_table)`` is called whenever a task
+    finishes, which the sweep page uses to stream results into the UI.
+    """
+    total = len(parameter_grid(ranges))
+    rows: dict[int, dict[str, float]] = {}
+    for finished in iter_parameter_sweep(
+        df,
+        base_settings,
+        ranges,
+        hydrogen=hydrogen,
+        max_workers=max_workers,
+        points_per_task=points_per_task,
+    ):
+        rows.update(finished)
+        if progress is not None:
+            progress(len(rows), total, _as_table(rows))
+    return _as_table(rows)
+
+
+def _as_table(rows: Mapping[int, dict[str, float]]) -> pd.DataFrame:
+    return pd.DataFrame([rows[index] for index in sorted(rows)])
@@ -0,0 +1,478 @@
+"""
+Benchmark suite for the simulation and preprocessing hot paths.
+
+    python -m benchmarks.run                       # all sizes, compare to baseline
+    python -m benchmarks.run --sizes 1y-hourly     # quick run
+    python -m benchmarks.run --update-baseline     # accept the current timings
+
+Every run writes its timings to ``--output`` and compares them against
+``--baseline`` (created on the first run). The exit status is non-zero when
+an equivalence check fails or a case got slower than ``--max-slowdown``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from streamlit import config as streamlit_config
+from streamlit import logger as streamlit_logger
+
+from app.batch import run_batch_simulation
+from app.battery_and_hydrogen import (
+    run_battery_and_hydrogen_simulation,
+    run_battery_and_hydrogen_simulation_reference,
+)
+from app.battery_only import (
+    run_battery_only_simulation,
+    run_battery_only_simulation_reference,
+)
+from app.cache import cached_run_battery_and_hydrogen_simulation
+from app.downsample import downsample_frame
+from app.engine import numba_available
+from app.graph.buy_electrivity import plot_buy_electricity
+from app.graph.common import (
+    CHART_RENDERERS,
+    figure_cache,
+    monthly_cache,
+    monthly_totals,
+)
+from app.graph.h2_storage_kwh import plot_h2_storage_kwh
+from app.graph.repair_the_cottage import plot_repair_the_cottage
+from app.graph.sell_electricity import plot_sell_electricity
+from app.preprocess.data_process import (
+    merge_and_compress_hourly,
+    read_hourly_frame,
+    transform_to_simulation_df,
+)
+from app.stages import run_summary_simulation
+from app.summary import compute_metrics
+from benchmarks.synthetic import (
+    DEFAULT_SETTINGS,
+    make_hourly_frame,
+    make_raw_means_frame,
+    write_raw_logger_csvs,
+)
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCHMARK_DIR / "baseline.json"
+DEFAULT_OUTPUT = BENCHMARK_DIR / "results" / "latest.json"
+
+# データサイズ: 名前 -> (行数, 時間間隔)
+SIZES = {
+    "1y-hourly": (24 * 365, "h"),
+    "10y-hourly": (24 * 365 * 10, "h"),
+    "1y-1min": (60 * 24 * 365, "min"),
+}
+PLOTS = {
+    "sell_electricity": plot_sell_electricity,
+    "buy_electricity": plot_buy_electricity,
+    "h2_storage_kwh": plot_h2_storage_kwh,
+    "repair_the_cottage": plot_repair_the_cottage,
+}
+# 前処理の計測パターン: 名前 -> merge_and_compress_hourly の追加引数
+MERGE_VARIANTS = {
+    "default": {},
+    "selective": {"selective_columns": True},
+    "selective-pyarrow": {"selective_columns": True, "csv_engine": "pyarrow"},
+    "streaming": {"chunksize": 100_000},
+    "workers2": {"max_workers": 2},
+}
+# 配列演算版は累積和で SOC を求めるため、丸め誤差分だけ許容する
+VECTORIZED_RTOL = 1e-9
+MERGE_RTOL = 1e-9
+# 集計のみモードはブロックごとに足し合わせるので、合計の順序の違いだけ許容する
+SUMMARY_RTOL = 1e-9
+# float32 の結果列は単精度への丸め分だけ許容する
+FLOAT32_RTOL = 1e-6
+REFERENCE_ROWS = 24 * 365
+# 一括計算と 1 シナリオずつの実行を比べるパラメータの組（残りは DEFAULT_SETTINGS）
+BATCH_SCENARIOS = [
+    {},
+    {"max_battery_capacity": 5.0, "battery_rated_power_kwh": 1.5},
+    {"max_battery_capacity": 30.0, "buy_price": 40.0, "sell_price": 8.0},
+    {"h2_storage_capacity_kwh": 20.0, "el_efficiency": 0.7, "fc_rated_power_kwh": 1.0},
+    {"production_month": [5, 6, 7], "consumption_month": [11, 12, 1, 2]},
+]
+# 数ミリ秒のケースは揺らぎが大きいので、この差未満の遅化は無視する
+MIN_REGRESSION_SECONDS = 0.01
+
+
+def time_call(fn: Callable[[], object], repeat: int) -> float:
+    """
+    Best wall time of ``repeat`` calls, in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _plot(plot: Callable[..., None], df: pd.DataFrame, renderer: str) -> None:
+    # 集計・描画のキャッシュを空にして、毎回描き直す時間を測る
+    monthly_cache.clear()
+    figure_cache.clear()
+    plot(df, renderer)
+    plt.close("all")
+
+
+def _backends() -> list[str]:
+    return (["numba"] if numba_available() else []) + ["python", "vectorized"]
+
+
+def simulation_cases(size: str, repeat: int) -> dict[str, dict]:
+    periods, freq = SIZES[size]
+    df = make_hourly_frame(periods, freq=freq, seed=1)
+    raw_means = make_raw_means_frame(periods, freq=freq, seed=2)
+    step_hours = 1.0 if freq == "h" else 1.0 / 60.0
+    results = {}
+
+    def record(name: str, fn: Callable[[], object], rows: int = periods) -> None:
+        fn()  # JIT コンパイルやキャッシュの温め
+        seconds = time_call(fn, repeat)
+        results[f"{name}/{size}"] = {"seconds": seconds, "rows": rows}
+        print(f"  {name:<40} {seconds:9.4f} s")
+
+    for backend in _backends():
+        record(
+            f"battery_only[{backend}]",
+            lambda: run_battery_only_simulation(df, DEFAULT_SETTINGS, backend=backend),
+        )
+        if backend != "vectorized":
+            record(
+                f"battery_and_hydrogen[{backend}]",
+                lambda: run_battery_and_hydrogen_simulation(
+                    df, DEFAULT_SETTINGS, backend=backend
+                ),
+            )
+    record(
+        "summary_only[battery_and_hydrogen]",
+        lambda: run_summary_simulation(df, DEFAULT_SETTINGS),
+    )
+    record(
+        "transform_to_simulation_df",
+        lambda: transform_to_simulation_df(raw_means, step_hours=step_hours),
+    )
+
+    # 画面と同じく結果キャッシュ経由で作る（グラフのキャッシュキーが再ハッシュ不要）
+    result = cached_run_battery_and_hydrogen_simulation(df, DEFAULT_SETTINGS)
+    for name, plot in PLOTS.items():
+        for renderer in CHART_RENDERERS:
+            record(f"plot_{name}[{renderer}]", lambda: _plot(plot, result, renderer))
+            record(f"plot_{name}[{renderer},cached]", lambda: plot(result, renderer))
+    record(
+        "downsample_frame",
+        lambda: downsample_frame(result, ["batt_soc_kwh", "h2_storage_kwh"]),
+    )
+    return results
+
+
+def merge_cases(raw_dir: Path, work_dir: Path, repeat: int) -> dict[str, dict]:
+    results = {}
+    files = sum(1 for _ in raw_dir.glob("*.csv"))
+    for name, kwargs in MERGE_VARIANTS.items():
+        output_dir = work_dir / f"merge-{name}"
+        seconds = time_call(
+            lambda: merge_and_compress_hourly(raw_dir, output_dir, **kwargs), repeat
+        )
+        results[f"merge_and_compress_hourly[{name}]/{files}d-raw"] = {
+            "seconds": seconds,
+            "files": files,
+        }
+        print(f"  {f'merge_and_compress_hourly[{name}]':<40} {seconds:9.4f} s")
+    return results
+
+
+def check_equivalence(raw_dir: Path, work_dir: Path) -> list[str]:
+    """
+    Compare the fast implementations against the reference ones and return
+    the names of the failed checks.
+    """
+    failures = []
+
+    def check(name: str, compare: Callable[[], None]) -> None:
+        try:
+            compare()
+        except AssertionError as error:
+            failures.append(name)
+            print(f"  NG  {name}\n{error}")
+        else:
+            print(f"  OK  {name}")
+
+    # 行ごとの参照実装は遅いので 1 年分の時間値（欠損あり）で比較する
+    df = make_hourly_frame(REFERENCE_ROWS, seed=3, missing=24)
+    expected_battery = run_battery_only_simulation_reference(df, DEFAULT_SETTINGS)
+    expected_hydrogen = run_battery_and_hydrogen_simulation_reference(
+        df, DEFAULT_SETTINGS
+    )
+    for backend in _backends():
+        rtol = VECTORIZED_RTOL if backend == "vectorized" else 0.0
+        check(
+            f"battery_only[{backend}] == reference",
+            lambda: pd.testing.assert_frame_equal(
+                run_battery_only_simulation(df, DEFAULT_SETTINGS, backend=backend),
+                expected_battery,
+                check_dtype=False,
+                rtol=rtol,
+                atol=0.0,
+            ),
+        )
+        if backend != "vectorized":
+            check(
+                f"battery_and_hydrogen[{backend}] == reference",
+                lambda: pd.testing.assert_frame_equal(
+                    run_battery_and_hydrogen_simulation(
+                        df, DEFAULT_SETTINGS, backend=backend
+                    ),
+                    expected_hydrogen,
+                    check_dtype=False,
+                    rtol=0.0,
+                    atol=0.0,
+                ),
+            )
+    for hydrogen, expected in ((False, expected_battery), (True, expected_hydrogen)):
+        scenario = "battery_and_hydrogen" if hydrogen else "battery_only"
+
+        def compare_summary() -> None:
+            summary = run_summary_simulation(
+                df, DEFAULT_SETTINGS, hydrogen=hydrogen, block_rows=1000
+            )
+            metrics = compute_metrics(expected)
+            np.testing.assert_allclose(
+                [summary.metrics()[key] for key in metrics],
+                list(metrics.values()),
+                rtol=SUMMARY_RTOL,
+            )
+            pd.testing.assert_frame_equal(
+                summary.monthly, monthly_totals(expected), rtol=SUMMARY_RTOL
+            )
+
+        check(f"summary_only[{scenario}] == reference", compare_summary)
+    check(
+        "battery_and_hydrogen[float32] == reference",
+        lambda: pd.testing.assert_frame_equal(
+            run_battery_and_hydrogen_simulation(df, DEFAULT_SETTINGS, dtype="float32"),
+            expected_hydrogen,
+            check_dtype=False,
+            rtol=FLOAT32_RTOL,
+            atol=0.0,
+        ),
+    )
+    check(
+        "cached[battery_and_hydrogen] == reference",
+        lambda: pd.testing.assert_frame_equal(
+            cached_run_battery_and_hydrogen_simulation(df, DEFAULT_SETTINGS).to_frame(),
+            expected_hydrogen,
+            check_dtype=False,
+            rtol=0.0,
+            atol=0.0,
+        ),
+    )
+    check(
+        "battery_and_hydrogen[workers=2] == reference",
+        lambda: pd.testing.assert_frame_equal(
+            run_battery_and_hydrogen_simulation(df, DEFAULT_SETTINGS, workers=2),
+            expected_hydrogen,
+            check_dtype=False,
+            rtol=0.0,
+            atol=0.0,
+        ),
+    )
+
+    # 一括計算は独自のループなので、シナリオごとの通常実行と結果をそろえる
+    for hydrogen in (False, True):
+        scenario = "battery_and_hydrogen" if hydrogen else "battery_only"
+        run = (
+            run_battery_and_hydrogen_simulation
+            if hydrogen
+            else run_battery_only_simulation
+        )
+
+        def compare_batch() -> None:
+            batch = run_batch_simulation(
+                df,
+                BATCH_SCENARIOS,
+                hydrogen=hydrogen,
+                base_settings=DEFAULT_SETTINGS,
+                return_frames=True,
+            )
+            for index, overrides in enumerate(BATCH_SCENARIOS):
+                expected = run(df, {**DEFAULT_SETTINGS, **overrides})
+                pd.testing.assert_frame_equal(
+                    batch.frames[index], expected, check_dtype=False, rtol=0.0, atol=0.0
+                )
+                metrics = compute_metrics(expected)
+                np.testing.assert_allclose(
+                    batch.summary.loc[index, list(metrics)].to_numpy(dtype=float),
+                    list(metrics.values()),
+                    rtol=SUMMARY_RTOL,
+                )
+
+        check(f"batch[{scenario}] == {scenario}", compare_batch)
+
+    # 前処理は既定の設定の出力を基準にする
+    def merged(name: str, **kwargs) -> pd.DataFrame:
+        output = merge_and_compress_hourly(raw_dir, work_dir / name, **kwargs)
+        return read_hourly_frame(output)
+
+    expected = merged("eq")
+    for name, kwargs in MERGE_VARIANTS.items():
+        if not kwargs:
+            continue
+        check(
+            f"merge_and_compress_hourly[{name}] == default",
+            lambda: pd.testing.assert_frame_equal(
+                merged(f"eq-{name}", **kwargs),
+                expected,
+                check_dtype=False,
+                rtol=MERGE_RTOL,
+            ),
+        )
+    return failures
+
+
+def compare(
+    results: dict[str, dict], baseline: dict[str, dict], max_slowdown: float
+) -> list[str]:
+    """
+    Print each case against the baseline and return the regressed cases.
+    """
+    regressions = []
+    print(f"\n{'case':<58} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<58} {'-':>10} {current['seconds']:10.4f} {'new':>7}")
+            continue
+        ratio = current["seconds"] / before["seconds"]
+        flag = ""
+        slower = current["seconds"] - before["seconds"]
+        if ratio > max_slowdown and slower > MIN_REGRESSION_SECONDS:
+            regressions.append(name)
+            flag = "  <-- slower"
+        print(
+            f"{name:<58} {before['seconds']:10.4f} {current['seconds']:10.4f}"
+            f" {ratio:6.2f}x{flag}"
+        )
+    return regressions
+
+
+def environment() -> dict[str, object]:
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "numba": numba_available(),
+    }
+
+
+def save(path: Path, results: dict[str, dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {"environment": environment(), "results": results}
+    path.write_text(json.dumps(payload, indent=2, ensure_ascii=False) + "\n")
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        choices=list(SIZES),
+        default=list(SIZES),
+        metavar="SIZE",
+        help=f"data sizes to run ({', '.join(SIZES)})",
+    )
+    parser.add_argument(
+        "--raw-days", type=int, default=2, help="days of raw logger CSV to merge"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="overwrite the baseline with this run instead of comparing",
+    )
+    parser.add_argument(
+        "--max-slowdown",
+        type=float,
+        default=1.5,
+        help="fail when a case takes longer than this multiple of the baseline",
+    )
+    parser.add_argument("--skip-merge", action="store_true")
+    parser.add_argument("--skip-checks", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+
+    # Streamlit の外で st.pyplot を呼ぶと出る警告を抑える（設定の読み込みで
+    # ログレベルが戻るので、先に読み込んでから下げる）
+    streamlit_logger.set_log_level("error")
+    streamlit_config.get_config_options()
+    streamlit_config.set_option("global.showWarningOnDirectExecution", False)
+    streamlit_logger.set_log_level("error")
+
+    results: dict[str, dict] = {}
+    failures: list[str] = []
+    with tempfile.TemporaryDirectory(prefix="greennavi-bench-") as tmp:
+        work_dir = Path(tmp)
+        raw_dir = work_dir / "raw"
+        if not args.skip_merge or not args.skip_checks:
+            write_raw_logger_csvs(raw_dir, args.raw_days)
+
+        for size in args.sizes:
+            print(f"[{size}]")
+            results.update(simulation_cases(size, args.repeat))
+        if not args.skip_merge:
+            print("[preprocess]")
+            results.update(merge_cases(raw_dir, work_dir, args.repeat))
+        if not args.skip_checks:
+            print("[equivalence]")
+            failures = check_equivalence(raw_dir, work_dir)
+
+    save(args.output, results)
+    print(f"\nresults: {args.output}")
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())["results"]
+
+    regressions = []
+    if baseline and not args.update_baseline:
+        regressions = compare(results, baseline, args.max_slowdown)
+    else:
+        # 一部のサイズだけ実行した場合も他のケースの基準値は残す
+        save(args.baseline, {**baseline, **results})
+        print(f"baseline: {args.baseline}")
+
+    if failures:
+        print(f"\n{len(failures)} equivalence check(s) failed")
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than {args.max_slowdown}x baseline")
+    return 1 if failures or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
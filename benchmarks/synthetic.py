@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+# サイドバーの初期値と同じシミュレーション設定
+DEFAULT_SETTINGS = {
+    "mode": "蓄電池 + 水素",
+    "max_battery_capacity": 14.6,
+    "buy_price": 31.0,
+    "sell_price": 16.0,
+    "battery_rated_power_kwh": 3.0,
+    "el_rated_power_kwh": 3.0,
+    "el_efficiency": 0.5,
+    "h2_storage_capacity_kwh": 200.0,
+    "fc_rated_power_kwh": 3.0,
+    "fc_efficiency": 0.5,
+    "production_month": [4, 5, 6, 7, 8, 9, 10, 11],
+    "consumption_month": [1, 2, 3, 12],
+}
+
+# ロガー生データ CSV の列（直流母線の列名は実データと同じく全角スペース入り）
+RAW_LOGGER_COLUMNS = [
+    "INDEX",
+    "TIME",
+    "太陽光EZAグリッド電力(W)",
+    "太陽光EZAバッテリ電力(W)",
+    "バッテリEZAグリッド側電力(W)",
+    "バッテリEZAバッテリ側電力(W)",
+    "パワコンCT電流（00.00A）",
+    "直流母線　計測電圧（000.0V)",
+    "制御電源電流(0.00A)",
+    "バッテリSOC(%)",
+    "INDEX.1",
+    "TIME.1",
+]
+
+
+def _daylight(time: pd.DatetimeIndex) -> np.ndarray:
+    """
+    0..1 solar profile: zero at night, peaking at noon, weaker in winter.
+    """
+    hour = time.hour.to_numpy() + time.minute.to_numpy() / 60.0
+    day = np.clip(np.sin((hour - 6.0) / 12.0 * np.pi), 0.0, None)
+    season = 0.75 + 0.25 * np.cos((time.dayofyear.to_numpy() - 172) / 365.0 * 2 * np.pi)
+    return day * season
+
+
+def make_hourly_frame(
+    periods: int,
+    freq: str = "h",
+    seed: int = 0,
+    start: str = "2024-04-01",
+    missing: int = 0,
+) -> pd.DataFrame:
+    """
+    Synthetic simulation input (``TIME``, ``load_site_kwh``,
+    ``pv_net_pos_kwh``, ``batt_soc_kwh``) with energies per row, so 1-minute
+    rows carry 1/60 of the hourly values. ``missing`` rows get a NaN load.
+    """
+    rng = np.random.default_rng(seed)
+    time = pd.date_range(start, periods=periods, freq=freq)
+    step_hours = pd.Timedelta(to_offset(freq)) / pd.Timedelta(hours=1)
+
+    pv = _daylight(time) * rng.uniform(0.0, 6.0, periods) * step_hours
+    load = rng.uniform(0.2, 3.5, periods) * step_hours
+    soc = np.full(periods, np.nan)
+    soc[0] = 7.0
+
+    df = pd.DataFrame(
+        {
+            "TIME": time,
+            "load_site_kwh": load,
+            "pv_net_pos_kwh": pv,
+            "batt_soc_kwh": soc,
+        }
+    )
+    if missing:
+        df.loc[rng.integers(1, periods, missing), "load_site_kwh"] = np.nan
+    return df
+
+
+def make_raw_means_frame(
+    periods: int,
+    freq: str = "h",
+    seed: int = 0,
+    start: str = "2024-04-01",
+) -> pd.DataFrame:
+    """
+    Synthetic resampled logger means, i.e. the input of
+    ``transform_to_simulation_df``.
+    """
+    rng = np.random.default_rng(seed)
+    time = pd.date_range(start, periods=periods, freq=freq)
+    pv = -_daylight(time) * rng.uniform(0.0, 1700.0, periods)
+
+    return pd.DataFrame(
+        {
+            "TIME": time,
+            "太陽光EZAグリッド電力(W)": pv * 0.6,
+            "太陽光EZAバッテリ電力(W)": pv * 0.4,
+            "バッテリEZAグリッド側電力(W)": rng.normal(0.0, 300.0, periods),
+            "バッテリEZAバッテリ側電力(W)": rng.normal(0.0, 300.0, periods),
+            "パワコンCT電流（00.00A）": rng.uniform(100.0, 1500.0, periods),
+            "直流母線　計測電圧（000.0V)": rng.uniform(3400.0, 3800.0, periods),
+            "制御電源電流(0.00A)": rng.uniform(20.0, 80.0, periods),
+            "バッテリSOC(%)": rng.uniform(20.0, 100.0, periods),
+        }
+    )
+
+
+def write_raw_logger_csvs(
+    directory: str | Path,
+    days: int,
+    seed: int = 0,
+    interval: str = "2s",
+    start: str = "2025-01-01",
+    bad_times: int = 20,
+) -> list[Path]:
+    """
+    Write ``days`` daily logger files (Shift_JIS, two header lines, the
+    duplicated ``INDEX.1`` / ``TIME.1`` columns) into ``directory``.
+
+    ``bad_times`` rows per file get an unparseable ``TIME`` so the
+    drop-invalid-timestamps path is exercised too.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    paths = []
+    for day in pd.date_range(start, periods=days, freq="D"):
+        time = pd.date_range(day, day + pd.Timedelta(days=1), freq=interval)[:-1]
+        n = len(time)
+        stamps = time.strftime("%Y/%m/%d %H:%M:%S").to_numpy(dtype=object)
+        stamps[rng.integers(0, n, bad_times)] = "----/--/-- --:--:--"
+        pv = -_daylight(time) * rng.uniform(0.0, 1700.0, n)
+
+        values = {
+            "INDEX": np.arange(n),
+            "TIME": stamps,
+            "太陽光EZAグリッド電力(W)": (pv * 0.6).round(1),
+            "太陽光EZAバッテリ電力(W)": (pv * 0.4).round(1),
+            "バッテリEZAグリッド側電力(W)": rng.normal(0.0, 300.0, n).round(1),
+            "バッテリEZAバッテリ側電力(W)": rng.normal(0.0, 300.0, n).round(1),
+            "パワコンCT電流（00.00A）": rng.integers(100, 1500, n),
+            "直流母線　計測電圧（000.0V)": rng.integers(3400, 3800, n),
+            "制御電源電流(0.00A)": rng.integers(20, 80, n),
+            "バッテリSOC(%)": rng.uniform(20.0, 100.0, n).round(1),
+            "INDEX.1": np.arange(n),
+            "TIME.1": stamps,
+        }
+        path = directory / f"{day:%Y%m%d}.csv"
+        with open(path, "w", encoding="shift_jis", newline="") as f:
+            f.write("GreenNavi logger export\n")
+            f.write(f"{day:%Y/%m/%d}\n")
+            pd.DataFrame(values, columns=RAW_LOGGER_COLUMNS).to_csv(f, index=False)
+        paths.append(path)
+    return paths